@@ -0,0 +1,76 @@
+import os
+import random
+
+# Vocabulary for synthetic documents, close to the cloud/networking docs we see in practice
+WORDS = (
+    "cloud network subnet gateway router firewall instance region zone storage "
+    "bucket policy access role user group key encryption traffic route table "
+    "peering endpoint service load balancer scaling health check latency "
+    "throughput bandwidth packet address range private public virtual machine "
+    "container cluster node deployment configuration monitoring logging alert"
+).split()
+
+WORDS_PER_PAGE = 500  # Same estimate extract_text uses for DOCX/TXT
+
+
+def make_sentences(rng, count):
+    """Random sentences of 8-20 words"""
+    sentences = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return sentences
+
+
+def make_pages(rng, pages):
+    """Text for each page, roughly WORDS_PER_PAGE words per page"""
+    return [" ".join(make_sentences(rng, WORDS_PER_PAGE // 14)) for _ in range(pages)]
+
+
+def write_txt(path, pages):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(pages))
+
+
+def write_docx(path, pages):
+    from docx import Document as DocxDocument
+
+    doc = DocxDocument()
+    for page_num, page in enumerate(pages):
+        doc.add_heading(f"Section {page_num + 1}", level=1)
+        for para in page.split(". "):
+            doc.add_paragraph(para)
+    doc.save(path)
+
+
+def write_pdf(path, pages):
+    import fitz  # PyMuPDF
+
+    pdf = fitz.open()
+    for page in pages:
+        pdf_page = pdf.new_page()
+        rect = fitz.Rect(50, 50, pdf_page.rect.width - 50, pdf_page.rect.height - 50)
+        pdf_page.insert_textbox(rect, page, fontsize=9)
+    pdf.save(path)
+    pdf.close()
+
+
+WRITERS = {
+    "txt": write_txt,
+    "docx": write_docx,
+    "pdf": write_pdf,
+}
+
+
+def generate_corpus(out_dir, docs_per_type=5, pages=5, file_types=("pdf", "docx", "txt"), seed=42):
+    """Write a reproducible synthetic corpus and return the file paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for file_type in file_types:
+        writer = WRITERS[file_type]
+        for i in range(docs_per_type):
+            path = os.path.join(out_dir, f"synthetic_{i}.{file_type}")
+            writer(path, make_pages(rng, pages))
+            paths.append(path)
+    return paths
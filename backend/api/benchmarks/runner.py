@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from .corpus import generate_corpus
+from .stub_llm import StubLLMServer
+
+# Questions that cover every intent in services/intent.py
+QUESTIONS = [
+    "What is a subnet?",
+    "How does the load balancer check health?",
+    "List the steps to configure a route table",
+    "Create 5 multiple choice questions on encryption",
+    "Summarize this document",
+    "Show me the entire document",
+]
+
+BENCH_PREFIX = "benchmark"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples, wall_seconds=None, units=None):
+    """Latency stats in ms for a list of durations in seconds"""
+    ordered = sorted(samples)
+    wall = wall_seconds if wall_seconds is not None else sum(samples)
+    stats = {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "wall_s": round(wall, 3),
+        "ops_per_s": round(len(samples) / wall, 3) if wall else 0.0,
+    }
+    if units is not None:
+        # Throughput in the caller's unit (bytes, chars) per second
+        stats["units_per_s"] = round(units / wall, 1) if wall else 0.0
+    return stats
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+class BenchmarkRunner:
+    """Runs ingest and query benchmarks against a throwaway collection and test database"""
+
+    def __init__(self, docs_per_type=5, pages=5, file_types=("pdf", "docx", "txt"),
+                 queries=60, concurrency=4, llm_latency=0.0, provider="lmstudio",
+                 seed=42, log=print):
+        self.docs_per_type = docs_per_type
+        self.pages = pages
+        self.file_types = tuple(file_types)
+        self.queries = queries
+        self.concurrency = concurrency
+        self.llm_latency = llm_latency
+        self.provider = provider
+        self.seed = seed
+        self.log = log
+        self.results = {}
+
+    def run(self):
+        # Heavy imports (model + vector DB) only when actually benchmarking
+        from ..services import processor, rag, vector_store
+        from ..services.local_index import LocalVectorIndex
+
+        originals = (vector_store.router, rag.LM_STUDIO_URL, rag.groq_client,
+                     processor.local_index, rag.local_index)
+        # Same partitioning scheme as configured, under a throwaway prefix
+        live = vector_store.router
+        bench_router = vector_store.PartitionRouter(
+            live.client, scheme=live.scheme, prefix=BENCH_PREFIX, shards=live.shards,
+            size_classes=live.size_classes, max_workers=live.max_workers,
+        )
+        vector_store.router = bench_router
+
+        try:
+            with tempfile.TemporaryDirectory() as corpus_dir, \
+                    StubLLMServer(latency=self.llm_latency) as stub:
+                self._point_llms_at(rag, stub)
+                if rag.local_index is not None:
+                    # Same code path as configured, but never the real index files
+                    bench_index = LocalVectorIndex(os.path.join(corpus_dir, "vector_index"),
+                                                   rag.local_index.memory_budget)
+                    processor.local_index = rag.local_index = bench_index
+
+                self.log(f"Generating corpus in {corpus_dir}")
+                paths = generate_corpus(corpus_dir, self.docs_per_type, self.pages,
+                                        self.file_types, self.seed)
+
+                self.bench_extract(processor, paths)
+                self.bench_chunk(processor, paths)
+                doc_ids = self.bench_process(processor, paths)
+                self.bench_answer_query(rag, doc_ids)
+                self.bench_query_endpoint(doc_ids)
+        finally:
+            (vector_store.router, rag.LM_STUDIO_URL, rag.groq_client,
+             processor.local_index, rag.local_index) = originals
+            for name in bench_router.partition_names():
+                try:
+                    bench_router.drop(name)
+                except ValueError:
+                    pass  # Partition never created
+
+        return {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "params": {
+                    "docs_per_type": self.docs_per_type,
+                    "pages": self.pages,
+                    "file_types": list(self.file_types),
+                    "queries": self.queries,
+                    "concurrency": self.concurrency,
+                    "llm_latency_s": self.llm_latency,
+                    "provider": self.provider,
+                    "partitioning": bench_router.scheme,
+                    "seed": self.seed,
+                },
+            },
+            "results": self.results,
+        }
+
+    def _point_llms_at(self, rag, stub):
+        if self.provider == "groq":
+            from groq import Groq
+
+            # Nothing listens on port 9, so LM Studio fails fast and Groq answers
+            rag.LM_STUDIO_URL = "http://127.0.0.1:9/v1/chat/completions"
+            rag.groq_client = Groq(api_key="stub", base_url=stub.base_url)
+        else:
+            rag.LM_STUDIO_URL = stub.lm_studio_url
+
+    def bench_extract(self, processor, paths):
+        for file_type in self.file_types:
+            typed = [p for p in paths if p.endswith(f".{file_type}")]
+            samples = []
+            total_bytes = 0
+            for path in typed:
+                _, elapsed = timed(processor.extract_text, path)
+                samples.append(elapsed)
+                total_bytes += os.path.getsize(path)
+            self.results[f"extract_text.{file_type}"] = summarize(samples, units=total_bytes)
+            self.log(f"extract_text.{file_type}: {self.results[f'extract_text.{file_type}']}")
+
+    def bench_chunk(self, processor, paths):
+        texts = [processor.extract_text(p)[0] for p in paths]
+        samples = []
+        for text in texts:
+            _, elapsed = timed(processor.chunk_text, text)
+            samples.append(elapsed)
+        self.results["chunk_text"] = summarize(samples, units=sum(len(t) for t in texts))
+        self.log(f"chunk_text: {self.results['chunk_text']}")
+
+    def bench_process(self, processor, paths):
+        from ..models import Document
+
+        samples = []
+        doc_ids = []
+        for path in paths:
+            name = os.path.basename(path)
+            doc = Document.objects.create(
+                title=name,
+                file=f"benchmark/{name}",
+                file_size=os.path.getsize(path),
+                file_type=name.rsplit(".", 1)[-1],
+                status='P'
+            )
+            (success, page_count), elapsed = timed(processor.process_document, path, doc.id)
+            samples.append(elapsed)
+            doc.page_count = page_count
+            doc.status = 'C' if success else 'F'
+            doc.save()
+            if success:
+                doc_ids.append(doc.id)
+        self.results["process_document"] = summarize(samples)
+        self.log(f"process_document: {self.results['process_document']}")
+        return doc_ids
+
+    def bench_answer_query(self, rag, doc_ids):
+        if not doc_ids:
+            return
+        samples = []
+        start = time.perf_counter()
+        for i in range(self.queries):
+            doc_id = doc_ids[i % len(doc_ids)]
+            _, elapsed = timed(rag.answer_query, doc_id, QUESTIONS[i % len(QUESTIONS)])
+            samples.append(elapsed)
+        self.results["answer_query"] = summarize(samples, time.perf_counter() - start)
+        self.log(f"answer_query: {self.results['answer_query']}")
+
+    def bench_query_endpoint(self, doc_ids):
+        if not doc_ids:
+            return
+        from django.db import connection
+        from django.test import Client
+
+        def one_request(i):
+            client = Client()
+            start = time.perf_counter()
+            try:
+                response = client.post(
+                    "/api/query/",
+                    {"doc_id": doc_ids[i % len(doc_ids)], "question": QUESTIONS[i % len(QUESTIONS)]},
+                    content_type="application/json",
+                )
+                return time.perf_counter() - start, response.status_code
+            finally:
+                # Worker threads each open their own DB connection
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            outcomes = list(pool.map(one_request, range(self.queries)))
+        wall = time.perf_counter() - start
+
+        stats = summarize([elapsed for elapsed, _ in outcomes], wall)
+        stats["errors"] = sum(1 for _, code in outcomes if code != 200)
+        self.results[f"query_endpoint.c{self.concurrency}"] = stats
+        self.log(f"query_endpoint.c{self.concurrency}: {stats}")
+
+
+def write_results(results, output_path):
+    """Stable key order so two runs diff cleanly"""
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
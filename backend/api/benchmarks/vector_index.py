@@ -0,0 +1,72 @@
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from .runner import summarize, timed
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+CHROMA_BATCH = 5000  # Below ChromaDB's max batch size
+
+
+def random_unit_vectors(rng, count, dim=EMBEDDING_DIM):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_corpus_size(total_chunks, chunks_per_doc, queries, top_k, seed, log=print):
+    """Per-document top-k latency: ChromaDB filtered query vs LocalVectorIndex"""
+    import chromadb
+
+    from ..services.local_index import LocalVectorIndex
+
+    rng = np.random.default_rng(seed)
+    doc_count = max(1, total_chunks // chunks_per_doc)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = chromadb.PersistentClient(path=os.path.join(work_dir, "chroma"))
+        collection = client.get_or_create_collection("documents")
+        index = LocalVectorIndex(os.path.join(work_dir, "index"), memory_budget=512 * 1024 * 1024)
+
+        # Fill both stores with the same synthetic corpus
+        start = time.perf_counter()
+        pending = {"ids": [], "embeddings": [], "metadatas": []}
+
+        def flush():
+            collection.add(documents=["chunk"] * len(pending["ids"]), **pending)
+            for values in pending.values():
+                values.clear()
+
+        for doc_id in range(doc_count):
+            doc_vectors = random_unit_vectors(rng, chunks_per_doc)
+            doc_metas = [{"doc_id": str(doc_id), "chunk_index": i} for i in range(chunks_per_doc)]
+            index.add(doc_id, doc_vectors, [f"chunk {i}" for i in range(chunks_per_doc)], doc_metas)
+            pending["ids"] += [f"{doc_id}_{i}" for i in range(chunks_per_doc)]
+            pending["embeddings"] += doc_vectors.tolist()
+            pending["metadatas"] += doc_metas
+            if len(pending["ids"]) >= CHROMA_BATCH:
+                flush()
+        if pending["ids"]:
+            flush()
+        log(f"{total_chunks} chunks loaded in {time.perf_counter() - start:.1f}s")
+
+        query_vectors = random_unit_vectors(rng, queries)
+        doc_ids = rng.integers(0, doc_count, size=queries)
+
+        chroma_samples, local_samples = [], []
+        for q, doc_id in zip(query_vectors, doc_ids):
+            _, elapsed = timed(
+                collection.query,
+                query_embeddings=[q.tolist()],
+                n_results=top_k,
+                where={"doc_id": str(doc_id)},
+            )
+            chroma_samples.append(elapsed)
+            _, elapsed = timed(index.query, doc_id, q, top_k)
+            local_samples.append(elapsed)
+
+    return {
+        f"chromadb.{total_chunks}": summarize(chroma_samples),
+        f"local_index.{total_chunks}": summarize(local_samples),
+    }
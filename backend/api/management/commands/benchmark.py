@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks.runner import BenchmarkRunner, write_results
+
+
+class Command(BaseCommand):
+    help = "Benchmark extract/chunk/process/query on a synthetic corpus with a stub LLM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, default=5, help='Documents per file type')
+        parser.add_argument('--pages', type=int, default=5, help='Pages per document')
+        parser.add_argument('--types', default='pdf,docx,txt', help='Comma-separated file types')
+        parser.add_argument('--queries', type=int, default=60, help='Queries per query benchmark')
+        parser.add_argument('--concurrency', type=int, default=4, help='Threads for endpoint load')
+        parser.add_argument('--llm-latency', type=float, default=0.0,
+                            help='Seconds the stub LLM sleeps per completion')
+        parser.add_argument('--provider', choices=['lmstudio', 'groq'], default='lmstudio',
+                            help='Which LLM path the stub stands in for')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='benchmark_results.json', help='JSON results file')
+
+    def handle(self, *args, **options):
+        file_types = [t.strip().lower() for t in options['types'].split(',') if t.strip()]
+        unknown = set(file_types) - {'pdf', 'docx', 'txt'}
+        if unknown:
+            raise CommandError(f"Unsupported file types: {', '.join(sorted(unknown))}")
+
+        runner = BenchmarkRunner(
+            docs_per_type=options['docs'],
+            pages=options['pages'],
+            file_types=file_types,
+            queries=options['queries'],
+            concurrency=options['concurrency'],
+            llm_latency=options['llm_latency'],
+            provider=options['provider'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+
+        # Document rows go to a throwaway test database, never the real one
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = runner.run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        write_results(results, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}"))
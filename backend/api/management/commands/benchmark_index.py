@@ -0,0 +1,50 @@
+import platform
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks.runner import git_commit, write_results
+from api.benchmarks.vector_index import bench_corpus_size
+
+
+class Command(BaseCommand):
+    help = "Compare per-document top-k latency of ChromaDB and the local vector index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma-separated total chunk counts')
+        parser.add_argument('--chunks-per-doc', type=int, default=100)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--top-k', type=int, default=15)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='benchmark_index_results.json')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        results = {}
+        for size in sizes:
+            self.stdout.write(f"Benchmarking {size} total chunks")
+            results.update(bench_corpus_size(
+                size, options['chunks_per_doc'], options['queries'], options['top_k'],
+                options['seed'], log=self.stdout.write,
+            ))
+            for name in (f"chromadb.{size}", f"local_index.{size}"):
+                self.stdout.write(f"  {name}: p50 {results[name]['p50_ms']} ms, p95 {results[name]['p95_ms']} ms")
+
+        write_results({
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "params": {
+                    "sizes": sizes,
+                    "chunks_per_doc": options['chunks_per_doc'],
+                    "queries": options['queries'],
+                    "top_k": options['top_k'],
+                    "seed": options['seed'],
+                },
+            },
+            "results": results,
+        }, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from api.services import vector_store
+
+
+class Command(BaseCommand):
+    help = "Move document chunks into the collections chosen by VECTOR_PARTITIONING"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='',
+                            help='Comma-separated collections to read (default: every '
+                                 '"<prefix>" / "<prefix>_*" collection)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Chunks per read/write')
+        parser.add_argument('--drop-empty', action='store_true',
+                            help='Delete source collections left empty')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would move')
+
+    def handle(self, *args, **options):
+        router = vector_store.router
+        batch_size = options['batch_size']
+
+        if options['source']:
+            sources = [s.strip() for s in options['source'].split(',') if s.strip()]
+        else:
+            sources = sorted(
+                c.name for c in router.client.list_collections()
+                if c.name == router.prefix or c.name.startswith(router.prefix + '_')
+            )
+        self.stdout.write(f"Scheme '{router.scheme}', scanning {len(sources)} collection(s)")
+
+        moved_docs = moved_chunks = 0
+        for source_name in sources:
+            source = router.collection(source_name)
+
+            # Group chunk ids by document using metadata only, a page at a time
+            chunks_by_doc = defaultdict(list)
+            tenants = {}
+            offset = 0
+            while True:
+                page = source.get(include=['metadatas'], limit=batch_size, offset=offset)
+                if not page['ids']:
+                    break
+                for chunk_id, meta in zip(page['ids'], page['metadatas']):
+                    chunks_by_doc[meta['doc_id']].append(chunk_id)
+                    if meta.get('tenant'):
+                        tenants[meta['doc_id']] = meta['tenant']
+                offset += len(page['ids'])
+
+            for doc_id, chunk_ids in chunks_by_doc.items():
+                target_name = router.partition_for(doc_id, chunk_count=len(chunk_ids),
+                                                   tenant=tenants.get(doc_id))
+                if target_name == source_name:
+                    continue
+
+                self.stdout.write(f"  doc {doc_id}: {len(chunk_ids)} chunks {source_name} -> {target_name}")
+                moved_docs += 1
+                moved_chunks += len(chunk_ids)
+                if options['dry_run']:
+                    continue
+
+                target = router.collection(target_name)
+                for start in range(0, len(chunk_ids), batch_size):
+                    batch_ids = chunk_ids[start:start + batch_size]
+                    data = source.get(ids=batch_ids, include=['documents', 'metadatas', 'embeddings'])
+                    # Upsert so an interrupted run can simply be repeated
+                    target.upsert(
+                        ids=data['ids'],
+                        documents=data['documents'],
+                        metadatas=data['metadatas'],
+                        embeddings=data['embeddings'],
+                    )
+                source.delete(ids=chunk_ids)
+                router.remember(doc_id, target_name)
+
+            if options['drop_empty'] and not options['dry_run'] and source.count() == 0 \
+                    and source_name not in router.partition_names():
+                router.drop(source_name)
+                self.stdout.write(f"  dropped empty collection {source_name}")
+
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved_chunks} chunks across {moved_docs} documents"))
@@ -0,0 +1,56 @@
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from api.services.snapshot import (
+    DTYPES, SnapshotError, export_snapshot, import_snapshot, verify_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = "Export/import documents, chunks and embeddings as a portable snapshot file"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+
+        export = subparsers.add_parser('export', help='Write a snapshot')
+        export.add_argument('path', help='Snapshot file to create')
+        export.add_argument('--since', help='Only documents changed at/after this ISO timestamp (UTC if no offset)')
+        export.add_argument('--dtype', choices=DTYPES, default='float16',
+                            help='Embedding precision stored in the file')
+        export.add_argument('--batch-size', type=int, default=5000, help='Chunks per batch entry')
+
+        load = subparsers.add_parser('import', help='Load a snapshot into this node')
+        load.add_argument('path', help='Snapshot file to read')
+        load.add_argument('--batch-size', type=int, default=500, help='Rows per bulk write')
+
+        verify = subparsers.add_parser('verify', help='Check a snapshot\'s checksums')
+        verify.add_argument('path', help='Snapshot file to check')
+
+    def handle(self, *args, **options):
+        action = options['action']
+        try:
+            if action == 'export':
+                since = None
+                if options['since']:
+                    since = parse_datetime(options['since'])
+                    if since is None:
+                        raise CommandError(f"Invalid --since timestamp: {options['since']}")
+                    if timezone.is_naive(since):
+                        since = timezone.make_aware(since, dt_timezone.utc)
+                manifest = export_snapshot(options['path'], since=since, dtype=options['dtype'],
+                                           batch_size=options['batch_size'], log=self.stdout.write)
+            elif action == 'import':
+                manifest = import_snapshot(options['path'], batch_size=options['batch_size'],
+                                           log=self.stdout.write)
+            else:
+                manifest = verify_snapshot(options['path'])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{action.capitalize()} OK: {manifest['documents']} documents, {manifest['chunks']} chunks "
+            f"(snapshot v{manifest['version']}, {manifest['dtype']})"
+        ))
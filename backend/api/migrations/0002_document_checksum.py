@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+# Adds the SHA-256 checksum computed while streaming uploads
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='checksum',
+            # Empty for documents uploaded before this migration
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+# Indexes for the paginated document listing
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_document_checksum'),
+    ]
+
+    operations = [
+        # Cursor pagination orders by created_at
+        migrations.AlterField(
+            model_name='document',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        # Listing filtered by status, newest first
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['status', '-created_at'], name='document_status_created_idx'),
+        ),
+    ]
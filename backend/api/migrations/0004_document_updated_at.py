@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:08
+
+from django.db import migrations, models
+
+# Tracks when a document last changed, for incremental snapshot exports
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_document_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='updated_at',
+            # Existing rows get the time the migration runs
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:24
+
+from django.db import migrations, models
+
+# Deletion counter that, with Document.updated_at, versions the document list
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_document_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentListState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deletions', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -12,8 +12,21 @@ class Document(models.Model):
     file_size = models.IntegerField()
     file_type = models.CharField(max_length=10)
     page_count = models.IntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, default='')  # SHA-256 of the file
     status = models.CharField(max_length=1, choices=STATUS_CHOICES, default='P')
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # For incremental snapshots and list ETags
+
+    class Meta:
+        indexes = [
+            # Status-filtered listing, newest first (also serves status-only lookups)
+            models.Index(fields=['status', '-created_at'], name='document_status_created_idx'),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+
+class DocumentListState(models.Model):
+    """Single row counting Document deletions, so list versions can see them without a COUNT"""
+    deletions = models.PositiveBigIntegerField(default=0)
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import F, Max
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .models import Document, DocumentListState
+
+# Counts are keyed by the list version, so this only bounds how long unused entries linger
+COUNT_CACHE_TIMEOUT = 300
+LIST_STATE_ID = 1
+
+
+def get_list_version(request=None):
+    """
+    Version token of the document list, read from the database so every worker
+    (and management commands) agree. Saves and inserts move the newest
+    updated_at; deletions bump DocumentListState (see signals.py). Both are
+    index lookups, and the result is kept on the request so it is read once.
+    """
+    version = getattr(request, '_document_list_version', None)
+    if version is not None:
+        return version
+
+    latest = Document.objects.aggregate(latest=Max('updated_at'))['latest']
+    deletions = DocumentListState.objects.filter(id=LIST_STATE_ID).values_list('deletions', flat=True).first()
+    version = f"{latest.timestamp() if latest else 0:.6f}-{deletions or 0}"
+    if request is not None:
+        request._document_list_version = version
+    return version
+
+
+def record_document_deletion():
+    """Bump the deletion counter (atomically, from any process)"""
+    if not DocumentListState.objects.filter(id=LIST_STATE_ID).update(deletions=F('deletions') + 1):
+        DocumentListState.objects.get_or_create(id=LIST_STATE_ID)
+        DocumentListState.objects.filter(id=LIST_STATE_ID).update(deletions=F('deletions') + 1)
+
+
+def get_document_count(queryset, status=None, request=None):
+    """Count documents (optionally by status), cached per list version"""
+    key = f"documents:count:{get_list_version(request)}:{status or 'all'}"
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_TIMEOUT)
+
+
+def document_list_etag(request, *args, **kwargs):
+    """ETag for GET /documents/: list version + the query string that shaped the page"""
+    params = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:12]
+    return f"{get_list_version(request)}-{params}"
+
+
+class DocumentCursorPagination(CursorPagination):
+    """Newest first, stable under inserts, uses the created_at index"""
+    ordering = '-created_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_paginated_response(self, data, count=None):
+        return Response({
+            'count': count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
@@ -4,4 +4,19 @@ from .models import Document
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class DocumentListSerializer(serializers.ModelSerializer):
+    """Lightweight listing; pass fields=[...] to return only some of them"""
+
+    class Meta:
+        model = Document
+        fields = ['id', 'title', 'file_type', 'file_size', 'page_count', 'status', 'created_at']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            # Drop everything not asked for
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
@@ -0,0 +1,254 @@
+import io
+import os
+import codecs
+import zipfile
+import logging
+
+import pdfplumber
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+WORDS_PER_PAGE = 500  # Page estimate for formats without real pages
+
+# WordprocessingML tags
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_P = W_NS + 'p'
+W_TBL = W_NS + 'tbl'
+W_TR = W_NS + 'tr'
+W_TC = W_NS + 'tc'
+W_T = W_NS + 't'
+W_TAB = W_NS + 'tab'
+W_BR = W_NS + 'br'
+W_PSTYLE = W_NS + 'pStyle'
+W_STYLE = W_NS + 'style'
+W_NAME = W_NS + 'name'
+W_VAL = W_NS + 'val'
+W_STYLE_ID = W_NS + 'styleId'
+
+TXT_READ_SIZE = 1024 * 1024  # Characters per read from large text files
+TXT_MAX_RECORD = 64 * 1024  # Split paragraphs longer than this
+ENCODING_SAMPLE_SIZE = 64 * 1024  # Bytes read to detect a text file's encoding
+
+
+class ExtractedRecords:
+    """
+    Iterable of text records (paragraphs, headings, table rows, pages) pulled
+    lazily from a file. page_count and char_count are final once iterated.
+    """
+
+    def __init__(self, generator, page_count=None):
+        self._generator = generator
+        self._fixed_pages = page_count
+        self.word_count = 0
+        self.char_count = 0
+
+    def __iter__(self):
+        for record in self._generator:
+            self.word_count += len(record.split())
+            self.char_count += len(record.strip())
+            yield record
+
+    @property
+    def page_count(self):
+        if self._fixed_pages is not None:
+            return self._fixed_pages
+        return max(1, self.word_count // WORDS_PER_PAGE)
+
+
+def _open_binary(file_path, file_obj):
+    """(binary file, should_close) for a path or an already-open file"""
+    if file_obj is not None:
+        file_obj.seek(0)
+        return file_obj, False
+    return open(file_path, 'rb'), True
+
+
+# ---- PDF ----
+
+def pdf_records(file_path, file_obj=None):
+    """One record per page; pdfplumber already reads page by page"""
+    pdf = pdfplumber.open(file_obj if file_obj is not None else file_path)
+
+    def pages():
+        with pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    yield page_text
+                # Drop parsed page objects as we go
+                page.flush_cache()
+
+    return ExtractedRecords(pages(), page_count=len(pdf.pages))
+
+
+# ---- DOCX ----
+
+def _docx_heading_styles(archive):
+    """Map styleId -> heading level from word/styles.xml ("Heading 2" -> 2, "Title" -> 1)"""
+    levels = {}
+    try:
+        styles_xml = archive.read('word/styles.xml')
+    except KeyError:
+        return levels
+    for style in etree.fromstring(styles_xml).iter(W_STYLE):
+        name_el = style.find(W_NAME)
+        name = (name_el.get(W_VAL) if name_el is not None else '').lower()
+        style_id = style.get(W_STYLE_ID)
+        if name == 'title':
+            levels[style_id] = 1
+        elif name.startswith('heading '):
+            try:
+                levels[style_id] = int(name.split()[1])
+            except ValueError:
+                pass
+    return levels
+
+
+def _paragraph_text(p):
+    parts = []
+    for el in p.iter(W_T, W_TAB, W_BR):
+        if el.tag == W_T:
+            parts.append(el.text or '')
+        elif el.tag == W_TAB:
+            parts.append('\t')
+        else:
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def _table_rows(tbl):
+    """
+    Each row as "cell | cell"; repeated text from merged cells is kept once.
+    Tables nested in a cell follow their row as rows of their own.
+    """
+    for tr in tbl.iterchildren(W_TR):
+        cells = []
+        nested = []
+        for tc in tr.iterchildren(W_TC):
+            text = ' '.join(_paragraph_text(p).strip() for p in tc.iterchildren(W_P)).strip()
+            if text and (not cells or cells[-1] != text):
+                cells.append(text)
+            nested.extend(tc.iterchildren(W_TBL))
+        if cells:
+            yield ' | '.join(cells)
+        for inner in nested:
+            yield from _table_rows(inner)
+
+
+def docx_records(file_path, file_obj=None):
+    """
+    Body paragraphs and tables in document order, parsed incrementally from
+    word/document.xml. Headings come out as "#"-prefixed records by level.
+    """
+    binary, should_close = _open_binary(file_path, file_obj)
+
+    def blocks():
+        try:
+            with zipfile.ZipFile(binary) as archive:
+                heading_levels = _docx_heading_styles(archive)
+                with archive.open('word/document.xml') as xml:
+                    for _, el in etree.iterparse(xml, events=('end',), tag=(W_P, W_TBL)):
+                        # Paragraphs (and tables) inside tables are handled with the outer table
+                        if next(el.iterancestors(W_TBL), None) is not None:
+                            continue
+                        parent = el.getparent()
+
+                        if el.tag == W_P:
+                            text = _paragraph_text(el).strip()
+                            if text:
+                                style = el.find(f'{W_NS}pPr/{W_PSTYLE}')
+                                level = heading_levels.get(style.get(W_VAL)) if style is not None else None
+                                yield f"{'#' * level} {text}" if level else text
+                        else:
+                            yield from _table_rows(el)
+
+                        # Free what has been processed so memory stays flat
+                        el.clear()
+                        while el.getprevious() is not None:
+                            del parent[0]
+        finally:
+            if should_close:
+                binary.close()
+
+    return ExtractedRecords(blocks())
+
+
+# ---- TXT ----
+
+def detect_encoding(sample, truncated=False):
+    """Encoding for a text file from its first bytes (truncated: there is more after them)"""
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8-sig'),
+                          (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+                          (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')):
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # Only a sample cut short may end part-way through a character
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=not truncated)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(sample).best()
+        if best is not None:
+            return best.encoding
+    except ImportError:
+        pass
+    return 'latin-1'
+
+
+def txt_records(file_path, file_obj=None, read_size=TXT_READ_SIZE):
+    """Blank-line separated paragraphs, read a block at a time"""
+    binary, should_close = _open_binary(file_path, file_obj)
+    sample = binary.read(ENCODING_SAMPLE_SIZE)
+    encoding = detect_encoding(sample, truncated=len(sample) == ENCODING_SAMPLE_SIZE)
+    binary.seek(0)
+    logger.info(f"Reading text as {encoding}")
+
+    def paragraphs():
+        # Don't let TextIOWrapper close a file we were handed
+        reader = io.TextIOWrapper(binary, encoding=encoding, errors='replace', newline=None)
+        try:
+            pending = ''
+            while True:
+                block = reader.read(read_size)
+                if not block:
+                    break
+                pending += block
+                *complete, pending = pending.split('\n\n')
+                for para in complete:
+                    if para.strip():
+                        yield para
+                # One enormous paragraph: cut at the last line break (or anywhere)
+                while len(pending) > TXT_MAX_RECORD:
+                    cut = pending.rfind('\n', 0, TXT_MAX_RECORD)
+                    cut = cut if cut > 0 else TXT_MAX_RECORD
+                    yield pending[:cut]
+                    pending = pending[cut:]
+            if pending.strip():
+                yield pending
+        finally:
+            reader.detach()
+            if should_close:
+                binary.close()
+
+    return ExtractedRecords(paragraphs())
+
+
+EXTRACTORS = {
+    '.pdf': pdf_records,
+    '.docx': docx_records,
+    '.txt': txt_records,
+}
+
+
+def extract_records(file_path, file_obj=None):
+    """Lazy records for a PDF, DOCX or TXT file"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in EXTRACTORS:
+        raise ValueError(f"Unsupported file format: {file_path}")
+    if file_obj is None and not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    return EXTRACTORS[extension](file_path, file_obj)
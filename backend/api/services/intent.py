@@ -0,0 +1,115 @@
+import re
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """How to retrieve chunks and generate an answer for one question"""
+    intent: str
+    fetch_all: bool = False        # Pull every chunk of the document instead of top-k
+    max_chunks: int = 15           # Top-k for semantic search
+    max_tokens: int = 800          # LLM response budget
+    temperature: float = 0.3
+    groq_model: str = "llama3-8b-8192"
+    full_fallback: bool = False    # Return all context (not a 3000 char excerpt) if LLMs fail
+
+
+# Intents are checked in order, first match wins. Each keyword is matched as a
+# whole word/phrase so "complete" does not fire on "incomplete".
+# Override with RAG_INTENTS in settings.py using the same shape.
+DEFAULT_INTENTS = [
+    {
+        "name": "full_document",
+        "keywords": [
+            "entire document", "whole document", "complete document", "full text",
+            "all content",
+        ],
+        "plan": {
+            "fetch_all": True,
+            "max_tokens": 4000,
+            "temperature": 0.1,
+            "groq_model": "llama3-70b-8192",
+            "full_fallback": True,
+        },
+    },
+    {
+        "name": "mcq",
+        "keywords": ["mcq", "mcqs", "multiple choice"],
+        "plan": {
+            "max_chunks": 20,
+            "max_tokens": 2000,
+            "temperature": 0.2,
+            "groq_model": "llama3-70b-8192",
+        },
+    },
+    {
+        "name": "summary",
+        "keywords": ["summary", "summarize", "summarise", "overview"],
+        "plan": {
+            "fetch_all": True,
+            "max_tokens": 1500,
+            "temperature": 0.3,
+        },
+    },
+    {
+        "name": "list",
+        "keywords": [
+            "questions", "list", "points", "items", "examples", "steps", "procedures",
+        ],
+        "plan": {
+            "max_chunks": 20,
+            "max_tokens": 2000,
+            "temperature": 0.2,
+        },
+    },
+    {
+        # Asks for a thorough answer, but not for the whole document
+        "name": "long_answer",
+        "keywords": ["complete", "everything"],
+        "plan": {
+            "max_tokens": 4000,
+            "temperature": 0.1,
+            "groq_model": "llama3-70b-8192",
+        },
+    },
+]
+
+DEFAULT_INTENT_NAME = "default"
+
+
+class IntentClassifier:
+    """Maps a question to a QueryPlan using one compiled regex per intent"""
+
+    def __init__(self, intents):
+        self.rules = []
+        for intent in intents:
+            keywords = sorted(intent["keywords"], key=len, reverse=True)
+            # \b on both sides; whitespace inside phrases matches any run of spaces
+            alternatives = [r"\s+".join(re.escape(w) for w in kw.split()) for kw in keywords]
+            pattern = re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+            plan = QueryPlan(intent=intent["name"], **intent.get("plan", {}))
+            self.rules.append((pattern, plan))
+        self.default_plan = QueryPlan(intent=DEFAULT_INTENT_NAME)
+
+    def classify(self, question):
+        """Return the plan of the first intent whose keywords appear in the question"""
+        for pattern, plan in self.rules:
+            if pattern.search(question or ""):
+                return plan
+        return self.default_plan
+
+
+# Built once at import, shared by retrieval and generation
+classifier = IntentClassifier(getattr(settings, "RAG_INTENTS", DEFAULT_INTENTS))
+
+
+def classify_question(question):
+    """Get the retrieval/generation plan for a question"""
+    plan = classifier.classify(question)
+    logger.info(f"Question classified as '{plan.intent}'")
+    return plan
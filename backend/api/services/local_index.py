@@ -0,0 +1,178 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """One document's vectors (memory-mapped) plus its chunk texts and metadata"""
+
+    def __init__(self, matrix, documents, metadatas, stamp):
+        self.matrix = matrix
+        self.documents = documents
+        self.metadatas = metadatas
+        self.stamp = stamp  # (inode, mtime) of the .npy this was loaded from
+        self.nbytes = matrix.nbytes + sum(len(d) for d in documents)
+
+
+class LocalVectorIndex:
+    """
+    Per-document float32 matrices on disk, memory-mapped on first use and
+    LRU-evicted once the loaded set exceeds memory_budget bytes.
+
+    Layout: <root>/<doc_id>.npy (L2-normalised rows) and <doc_id>.json
+    (chunk texts + metadata in the same order). Results use ChromaDB's
+    query()/get() shapes so callers can swap one for the other.
+    """
+
+    def __init__(self, root, memory_budget):
+        self.root = root
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._loaded_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, doc_id):
+        base = os.path.join(self.root, str(doc_id))
+        return base + ".npy", base + ".json"
+
+    def add(self, doc_id, embeddings, documents, metadatas):
+        """Write (or replace) a document's vectors"""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+
+        npy_path, json_path = self._paths(doc_id)
+        # Write to temp files then rename, so readers never see half a file
+        with open(npy_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(json_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"documents": list(documents), "metadatas": list(metadatas)}, f)
+        with self._lock:
+            self._evict(str(doc_id))
+            os.replace(npy_path + ".tmp", npy_path)
+            os.replace(json_path + ".tmp", json_path)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._evict(str(doc_id))
+            for path in self._paths(doc_id):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def _stamp(path):
+        """(inode, mtime) of a file, None if missing; changes on every add()'s rename"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._loaded_bytes -= entry.nbytes
+
+    def _load(self, doc_id):
+        """Entry for doc_id, loading from disk if needed; None if not indexed"""
+        key = str(doc_id)
+        npy_path, json_path = self._paths(doc_id)
+        with self._lock:
+            # Another process may have re-added or removed the document
+            stamp = self._stamp(npy_path)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.stamp == stamp:
+                    self._entries.move_to_end(key)
+                    return entry
+                self._evict(key)
+
+            if stamp is None or not os.path.exists(json_path):
+                return None
+            matrix = np.load(npy_path, mmap_mode="r")
+            with open(json_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if len(data["documents"]) != matrix.shape[0]:
+                # Caught between another process's two renames; treat as a miss
+                return None
+            entry = _Entry(matrix, data["documents"], data["metadatas"], stamp)
+
+            self._entries[key] = entry
+            self._loaded_bytes += entry.nbytes
+            # Drop least recently used documents over budget (always keep this one)
+            while self._loaded_bytes > self.memory_budget and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._loaded_bytes -= old.nbytes
+            return entry
+
+    def query(self, doc_id, query_embedding, n_results):
+        """Top-k chunks of one document by dot product; None on miss"""
+        entry = self._load(doc_id)
+        if entry is None:
+            return None
+
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        scores = entry.matrix @ q
+
+        k = min(n_results, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+
+        return {
+            "documents": [[entry.documents[i] for i in top]],
+            "metadatas": [[entry.metadatas[i] for i in top]],
+            # Squared L2 between unit vectors, matching ChromaDB's default space
+            "distances": [[float(2 - 2 * scores[i]) for i in top]],
+        }
+
+    def get(self, doc_id):
+        """All chunks of one document; None on miss"""
+        entry = self._load(doc_id)
+        if entry is None:
+            return None
+        return {"documents": list(entry.documents), "metadatas": list(entry.metadatas)}
+
+    def __contains__(self, doc_id):
+        return all(os.path.exists(p) for p in self._paths(doc_id))
+
+
+def _build_from_settings():
+    config = getattr(settings, "LOCAL_VECTOR_INDEX", {})
+    if not config.get("ENABLED", False):
+        return None
+    root = config.get("PATH", os.path.join(settings.BASE_DIR, "vector_index"))
+    budget = int(config.get("MEMORY_BUDGET_MB", 256)) * 1024 * 1024
+    logger.info(f"Local vector index enabled at {root} ({budget // (1024 * 1024)} MB budget)")
+    return LocalVectorIndex(root, budget)
+
+
+# Shared by ingest and query; None when disabled
+local_index = _build_from_settings()
+
+
+def populate_from_collection(collection, doc_id):
+    """Copy one document's chunks from ChromaDB into the local index"""
+    data = collection.get(where={"doc_id": str(doc_id)}, include=["documents", "metadatas", "embeddings"])
+    if not data["ids"]:
+        return False
+    # Keep chunk order stable regardless of ChromaDB's return order
+    order = sorted(range(len(data["ids"])), key=lambda i: data["metadatas"][i].get("chunk_index", i))
+    local_index.add(
+        doc_id,
+        [data["embeddings"][i] for i in order],
+        [data["documents"][i] for i in order],
+        [data["metadatas"][i] for i in order],
+    )
+    return True
@@ -0,0 +1,188 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds (seconds) for the stage latency histogram; LLM calls can take a minute
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Timings of the request currently being handled (None when not collecting)
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative bucket histogram keyed by label values"""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(names, key + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + ('+Inf',))} {series[-1]}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+# All metrics exported from /metrics
+stage_duration = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each ingest/query pipeline stage",
+    ["stage", "provider"],
+)
+stage_errors = Counter(
+    "rag_stage_errors_total",
+    "Pipeline stages that raised an exception",
+    ["stage", "provider"],
+)
+llm_fallbacks = Counter(
+    "rag_llm_fallbacks_total",
+    "Queries answered without LLM output, by fallback kind",
+    ["kind"],
+)
+REGISTRY = [stage_duration, stage_errors, llm_fallbacks]
+
+
+def _record(stage, provider, elapsed):
+    stage_duration.observe(elapsed, stage=stage, provider=provider)
+    timings = _request_timings.get()
+    if timings is not None:
+        name = f"{stage}:{provider}" if provider else stage
+        # Stages that run more than once per request (e.g. retries) add up
+        timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+
+@contextmanager
+def span(stage, provider=""):
+    """Time a block, record it in the stage histogram and the current request's timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage, provider=provider)
+        raise
+    finally:
+        _record(stage, provider, time.perf_counter() - start)
+
+
+class StageTotals:
+    """
+    Time for stages that run interleaved (e.g. a streamed ingest pulling
+    extract -> chunk -> embed -> store a batch at a time). Nested measurements
+    pause the outer one, so each stage gets only its own time; record() then
+    observes one total per stage, like a span around each would.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self._stack = []  # [stage, start of its current slice]
+
+    @contextmanager
+    def measure(self, stage):
+        now = time.perf_counter()
+        if self._stack:
+            self._add_slice(self._stack[-1], now)
+        self._stack.append([stage, now])
+        try:
+            yield
+        except Exception:
+            stage_errors.inc(stage=stage, provider="")
+            raise
+        finally:
+            now = time.perf_counter()
+            self._add_slice(self._stack.pop(), now)
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def _add_slice(self, entry, now):
+        stage, start = entry
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + now - start
+        entry[1] = now
+
+    def timed(self, iterable, stage):
+        """Iterate, counting the time spent producing each item towards stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.measure(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def record(self):
+        for stage, seconds in self.seconds.items():
+            _record(stage, "", seconds)
+
+
+def start_request_timings():
+    """Begin collecting a per-stage breakdown for the current request"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def stop_request_timings():
+    """Stop collecting and return the breakdown in milliseconds"""
+    timings = _request_timings.get() or {}
+    _request_timings.set(None)
+    return {name: round(ms, 2) for name, ms in timings.items()}
+
+
+def render_metrics():
+    """Prometheus text exposition of every registered metric"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,21 +1,18 @@
 import os
-import pdfplumber
-from docx import Document as DocxDocument
+from itertools import islice
 from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
 import logging
+from .metrics import StageTotals
+from .local_index import local_index
+from . import vector_store
+from .extractors import extract_records
 
 # Set up logging to track what's happening
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize ChromaDB (vector database) and embedding model
+# Initialize embedding model (ChromaDB collections come from vector_store.router)
 try:
-    # Connect to ChromaDB (stores our document chunks)
-    client = chromadb.PersistentClient(path="E:/ragproj/chromadb_data")
-    # Get or create collection for our documents
-    collection = client.get_or_create_collection("documents")
     # Load sentence embedding model (converts text to numbers)
     model = SentenceTransformer('all-MiniLM-L6-v2')
     logger.info("Document processor initialized successfully")
@@ -23,157 +20,192 @@ except Exception as e:
     logger.error(f"Error initializing document processor: {e}")
     raise
 
-def extract_text(file_path):
-    """Get text from PDF, DOCX or TXT files and count pages"""
-    logger.info(f"Extracting text from: {file_path}")
+EMBED_BATCH_SIZE = 256  # Chunks embedded and stored together while streaming
+
+def extract_text(file_path, file_obj=None):
+    """Get text from PDF, DOCX or TXT files and count pages
 
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
+    file_obj is an already-open binary file for file_path (e.g. from the
+    streaming upload handler); it is read instead of reopening the path.
+    Builds the whole text in memory - process_document streams instead.
+    """
+    logger.info(f"Extracting text from: {file_path}")
 
     try:
-        # Handle PDF files
-        if file_path.lower().endswith('.pdf'):
-            with pdfplumber.open(file_path) as pdf:
-                text_parts = []
-                # Go through each page and extract text
-                for page_num, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(page_text)
-                text = '\n'.join(text_parts)
-                logger.info(f"Extracted {len(text)} characters from PDF")
-                return text, len(pdf.pages)  # Return text + page count
-
-        # Handle Word documents
-        elif file_path.lower().endswith('.docx'):
-            doc = DocxDocument(file_path)
-            text_parts = []
-            # Get text from each paragraph
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text_parts.append(para.text)
-            text = '\n'.join(text_parts)
-            logger.info(f"Extracted {len(text)} characters from DOCX")
-            # Estimate pages (500 words per page)
-            page_count = max(1, len(text.split()) // 500)
-            return text, page_count
-
-        # Handle plain text files
-        elif file_path.lower().endswith('.txt'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-            logger.info(f"Extracted {len(text)} characters from TXT")
-            # Estimate pages (500 words per page)
-            page_count = max(1, len(text.split()) // 500)
-            return text, page_count
-
-        else:
-            raise ValueError(f"Unsupported file format: {file_path}")
+        records = extract_records(file_path, file_obj)
+        text = '\n'.join(records)
+        logger.info(f"Extracted {len(text)} characters from {os.path.splitext(file_path)[1][1:].upper()}")
+        return text, records.page_count
 
     except Exception as e:
         logger.error(f"Error extracting text from {file_path}: {e}")
         raise
 
-def chunk_text(text, chunk_size=800, overlap=100):
-    """Split long text into smaller pieces with some overlap"""
-    if not text or not text.strip():
-        logger.warning("Empty text provided for chunking")
-        return []
-
-    text = text.strip()
-    # Split text into sentences
-    sentences = text.replace('\n', ' ').split('. ')
+def iter_chunks(records, chunk_size=800, overlap=100):
+    """Chunk a stream of text records (paragraphs, pages) without joining them
 
-    chunks = []
+    Same sentence-packing as chunk_text, carried across record boundaries.
+    Yields chunks as they fill up; very small ones are dropped.
+    """
     current_chunk = ""
 
-    # Build chunks by adding sentences until size limit
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            # Keep some overlap between chunks
-            words = current_chunk.split()
-            overlap_words = words[-overlap // 10:] if len(words) > overlap // 10 else words
-            current_chunk = ' '.join(overlap_words) + ' ' + sentence
-        else:
-            current_chunk += sentence + '. '
-
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+    for record in records:
+        record = record.strip()
+        if not record:
+            continue
+        # Split text into sentences
+        sentences = record.replace('\n', ' ').split('. ')
+
+        # Build chunks by adding sentences until size limit
+        for sentence in sentences:
+            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
+                chunk = current_chunk.strip()
+                if len(chunk) > 50:
+                    yield chunk
+                # Keep some overlap between chunks
+                words = current_chunk.split()
+                overlap_words = words[-overlap // 10:] if len(words) > overlap // 10 else words
+                current_chunk = ' '.join(overlap_words) + ' ' + sentence
+            else:
+                current_chunk += sentence + '. '
 
     # Remove very small chunks
-    chunks = [chunk for chunk in chunks if len(chunk.strip()) > 50]
+    if len(current_chunk.strip()) > 50:
+        yield current_chunk.strip()
 
+def chunk_text(text, chunk_size=800, overlap=100):
+    """Split long text into smaller pieces with some overlap"""
+    if not text or not text.strip():
+        logger.warning("Empty text provided for chunking")
+        return []
+
+    chunks = list(iter_chunks([text], chunk_size, overlap))
     logger.info(f"Created {len(chunks)} chunks from text")
     return chunks
 
-def process_document(file_path, doc_id):
-    """Main function to process a document and store in database"""
+def _batches(iterable, size):
+    """Lists of up to size items from an iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def process_document(file_path, doc_id, file_obj=None, tenant=None):
+    """Main function to process a document and store in database
+
+    Text records stream from the file through the chunker, and chunks are
+    embedded and stored EMBED_BATCH_SIZE at a time, so neither the full text
+    nor all of its embeddings are held in memory.
+    """
     logger.info(f"Processing document {doc_id}: {file_path}")
 
-    try:
-        # Step 1: Extract text and count pages
-        text, page_count = extract_text(file_path)
-        if not text or len(text.strip()) < 10:
-            logger.error(f"Extracted text is too short or empty for document {doc_id}")
-            return False, page_count
+    router = vector_store.router
+    stages = StageTotals()
+    collection = None
+    chunk_count = 0
+    page_count = 0
 
-        # Step 2: Split text into manageable chunks
-        chunks = chunk_text(text)
-        if not chunks:
-            logger.error(f"No chunks created for document {doc_id}")
+    try:
+        # Steps 1-2: Pull text records into the chunker as it needs them
+        with stages.measure("extract"):
+            records = extract_records(file_path, file_obj)
+        chunks = iter_chunks(stages.timed(records, "extract"))
+
+        for batch in _batches(stages.timed(chunks, "chunk"), EMBED_BATCH_SIZE):
+            # Step 3: Convert this batch of chunks to numerical embeddings
+            with stages.measure("embed"):
+                embeddings = model.encode(batch).tolist()
+
+            # Step 4: Prepare data for database
+            chunk_ids = []
+            metadatas = []
+            for i, chunk in enumerate(batch, start=chunk_count):
+                # Create unique ID for each chunk
+                chunk_ids.append(f"{doc_id}_{i}")
+                # Store metadata about each chunk
+                metadata = {
+                    "doc_id": str(doc_id),
+                    "chunk_index": i,
+                    "chunk_length": len(chunk)
+                }
+                if tenant:
+                    metadata["tenant"] = tenant
+                metadatas.append(metadata)
+
+            # Step 5: Store in ChromaDB
+            try:
+                with stages.measure("store"):
+                    if collection is None:
+                        # Delete old chunks if this document was processed before (possibly elsewhere)
+                        existing = router.locate(doc_id)
+                        if existing is not None:
+                            logger.info(f"Deleting existing chunks for document {doc_id} from {existing.name}")
+                            existing.delete(where={"doc_id": str(doc_id)})
+                        # Drop the local copy; the first query reloads it from ChromaDB
+                        if local_index is not None:
+                            local_index.remove(doc_id)
+
+                        # Total size isn't known yet; the first batch is a lower bound
+                        partition = router.partition_for(doc_id, chunk_count=len(batch), tenant=tenant)
+                        collection = router.collection(partition)
+
+                    collection.add(
+                        documents=batch,
+                        metadatas=metadatas,
+                        ids=chunk_ids,
+                        embeddings=embeddings
+                    )
+            except Exception as chroma_error:
+                logger.error(f"ChromaDB storage error for document {doc_id}: {chroma_error}")
+                _discard_chunks(collection, doc_id)
+                return False, records.page_count
+
+            chunk_count += len(batch)
+
+        page_count = records.page_count
+        logger.info(f"Extracted {records.char_count} characters, created {chunk_count} chunks")
+        if chunk_count == 0:
+            if records.char_count < 10:
+                logger.error(f"Extracted text is too short or empty for document {doc_id}")
+            else:
+                logger.error(f"No chunks created for document {doc_id}")
             return False, page_count
 
-        # Step 3: Convert chunks to numerical embeddings
-        logger.info(f"Generating embeddings for {len(chunks)} chunks")
-        embeddings = model.encode(chunks).tolist()
-
-        # Step 4: Prepare data for database
-        chunk_ids = []
-        documents = []
-        metadatas = []
-        chunk_embeddings = []
-
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            # Create unique ID for each chunk
-            chunk_id = f"{doc_id}_{i}"
-            chunk_ids.append(chunk_id)
-            documents.append(chunk)
-            # Store metadata about each chunk
-            metadatas.append({
-                "doc_id": str(doc_id),
-                "chunk_index": i,
-                "chunk_length": len(chunk)
-            })
-            chunk_embeddings.append(embedding)
-
-        # Step 5: Store in ChromaDB
         try:
-            # Delete old chunks if this document was processed before
-            existing = collection.get(where={"doc_id": str(doc_id)})
-            if existing['ids']:
-                logger.info(f"Deleting {len(existing['ids'])} existing chunks for document {doc_id}")
-                collection.delete(where={"doc_id": str(doc_id)})
-
-            # Add new chunks to database
-            collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=chunk_ids,
-                embeddings=chunk_embeddings
-            )
-
-            logger.info(f"Successfully stored {len(chunk_ids)} chunks for document {doc_id}")
-            # Verify data was stored correctly
-            verification = collection.get(where={"doc_id": str(doc_id)})
-            logger.info(f"Verification: {len(verification['ids'])} chunks found in database")
-
-            return True, page_count
-
+            with stages.measure("store"):
+                # Size-partitioned documents may belong elsewhere now the count is known
+                final_partition = router.partition_for(doc_id, chunk_count=chunk_count, tenant=tenant)
+                if final_partition != partition:
+                    logger.info(f"Moving document {doc_id} from {partition} to {final_partition}")
+                    collection = router.move(doc_id, collection, final_partition)
+                router.remember(doc_id, final_partition)
         except Exception as chroma_error:
             logger.error(f"ChromaDB storage error for document {doc_id}: {chroma_error}")
+            _discard_chunks(collection, doc_id)
             return False, page_count
 
+        logger.info(f"Successfully stored {chunk_count} chunks for document {doc_id} in {final_partition}")
+        # Verify data was stored correctly
+        verification = collection.get(where={"doc_id": str(doc_id)}, include=[])
+        logger.info(f"Verification: {len(verification['ids'])} chunks found in database")
+
+        return True, page_count
+
     except Exception as e:
         logger.error(f"Error processing document {doc_id}: {e}")
-        return False, 0
\ No newline at end of file
+        _discard_chunks(collection, doc_id)
+        return False, page_count
+
+    finally:
+        stages.record()
+
+def _discard_chunks(collection, doc_id):
+    """Remove a partially stored document so a failure leaves nothing behind"""
+    if collection is None:
+        return
+    try:
+        collection.delete(where={"doc_id": str(doc_id)})
+    except Exception as cleanup_error:
+        logger.error(f"Could not remove partial chunks for document {doc_id}: {cleanup_error}")
@@ -1,27 +1,29 @@
 import requests
 from sentence_transformers import SentenceTransformer
-import chromadb
 import logging
 from groq import Groq
 import os
+from .intent import classify_question
+from .metrics import span, llm_fallbacks
+from .local_index import local_index, populate_from_collection
+from . import vector_store
 
 # Set up logging to track operations
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize ChromaDB and embedding model
+# Initialize embedding model (ChromaDB collections come from vector_store.router)
 try:
-    # Connect to our vector database
-    client = chromadb.PersistentClient(path="E:/ragproj/chromadb_data")
-    # Get our documents collection
-    collection = client.get_or_create_collection("documents")
     # Load model to convert text to vectors
     model = SentenceTransformer('all-MiniLM-L6-v2')
-    logger.info("ChromaDB and SentenceTransformer initialized successfully")
+    logger.info("SentenceTransformer initialized successfully")
 except Exception as e:
-    logger.error(f"Error initializing ChromaDB or SentenceTransformer: {e}")
+    logger.error(f"Error initializing SentenceTransformer: {e}")
     raise
 
+# Local LLM endpoint (LM Studio's OpenAI-compatible server)
+LM_STUDIO_URL = os.environ.get("LM_STUDIO_URL", "http://localhost:1234/v1/chat/completions")
+
 # Setup Groq client for AI responses
 try:
     groq_client = Groq(api_key="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")
@@ -30,41 +32,52 @@ except Exception as e:
     logger.error(f"Error initializing Groq client: {e}")
     groq_client = None
 
-def get_document_chunks_for_query(doc_id, question, max_chunks=15):
+def get_document_chunks_for_query(doc_id, question, plan=None, collection=None):
     """Find relevant document parts based on question"""
     
-    # Check question type to decide how much content to retrieve
-    question_lower = question.lower()
+    # Decide how much content to retrieve from the question type
+    if plan is None:
+        plan = classify_question(question)
     
     # For requests needing the whole document
-    if any(keyword in question_lower for keyword in [
-        'entire document', 'whole document', 'complete document', 'full text',
-        'all content', 'everything', 'summary', 'summarize', 'overview'
-    ]):
-        # Get ALL chunks from database
-        all_chunks = collection.get(where={"doc_id": str(doc_id)})
+    if plan.fetch_all:
+        # Get ALL chunks, from the local index when the document is there
+        all_chunks = local_index.get(doc_id) if local_index is not None else None
+        if all_chunks is None:
+            if collection is None:
+                collection = vector_store.router.locate(doc_id)
+            all_chunks = collection.get(where={"doc_id": str(doc_id)})
         if all_chunks['documents']:
             return {
                 'documents': [all_chunks['documents']],
                 'metadatas': [all_chunks['metadatas']]
             }
     
-    # For questions needing multiple answers (like lists)
-    elif any(keyword in question_lower for keyword in [
-        'mcq', 'multiple choice', 'questions', 'list', 'points', 'items',
-        'examples', 'steps', 'procedures'
-    ]):
-        max_chunks = 20  # Get more chunks for complex questions
-    
     # Regular semantic search - convert question to vector
     q_embedding = model.encode(question).tolist()
-    # Find most similar document chunks
+    
+    # Hot documents are searched in-process
+    if local_index is not None:
+        results = local_index.query(doc_id, q_embedding, plan.max_chunks)
+        if results is not None:
+            return results
+    
+    # Find most similar document chunks (partition resolved only if not given)
+    if collection is None:
+        collection = vector_store.router.locate(doc_id)
     results = collection.query(
         query_embeddings=[q_embedding],
-        n_results=max_chunks,
+        n_results=plan.max_chunks,
         where={"doc_id": str(doc_id)}
     )
     
+    # Missed the local index - load the document so the next query hits
+    if local_index is not None:
+        try:
+            populate_from_collection(collection, doc_id)
+        except Exception as index_error:
+            logger.warning(f"Could not add document {doc_id} to local index: {index_error}")
+    
     return results
 
 def answer_query(doc_id, question):
@@ -72,22 +85,27 @@ def answer_query(doc_id, question):
     logger.info(f"Processing query for doc_id: {doc_id}, question: {question}")
     
     try:
-        # 1. Check if document exists in database
-        try:
-            doc_results = collection.get(where={"doc_id": str(doc_id)})
-            logger.info(f"Total chunks found for doc_id {doc_id}: {len(doc_results['ids'])}")
+        # 1. Find the partition holding the document (already known if locally indexed)
+        collection = None
+        if local_index is None or doc_id not in local_index:
+            try:
+                with span("existence_check"):
+                    collection = vector_store.router.locate(doc_id)
+                
+                if collection is None:
+                    logger.error(f"No chunks found for document ID: {doc_id}")
+                    return {"error": f"Document {doc_id} not found in vector database. Please re-upload the document."}
+                logger.info(f"Document {doc_id} found in partition {collection.name}")
             
-            if len(doc_results['ids']) == 0:
-                logger.error(f"No chunks found for document ID: {doc_id}")
-                return {"error": f"Document {doc_id} not found in vector database. Please re-upload the document."}
-        
-        except Exception as chroma_error:
-            logger.error(f"ChromaDB access error: {chroma_error}")
-            return {"error": "Vector database access failed"}
+            except Exception as chroma_error:
+                logger.error(f"ChromaDB access error: {chroma_error}")
+                return {"error": "Vector database access failed"}
 
         # 2. Get relevant document parts
+        plan = classify_question(question)
         try:
-            results = get_document_chunks_for_query(doc_id, question)
+            with span("retrieve"):
+                results = get_document_chunks_for_query(doc_id, question, plan, collection)
             if not results['documents'][0]:
                 return {"answer": "No relevant information found in the document for this question."}
             
@@ -97,34 +115,18 @@ def answer_query(doc_id, question):
             return {"error": "Failed to search document"}
 
         # 3. Combine chunks into context for AI
-        context_parts = []
-        for i, (text, meta) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
-            if text and text.strip():
-                context_parts.append(f"[Chunk {meta.get('chunk_index', i)}]: {text.strip()}")
-        
-        context = "\n\n".join(context_parts)
+        with span("context_build"):
+            context_parts = []
+            for i, (text, meta) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
+                if text and text.strip():
+                    context_parts.append(f"[Chunk {meta.get('chunk_index', i)}]: {text.strip()}")
+            
+            context = "\n\n".join(context_parts)
         logger.info(f"Context prepared with {len(context_parts)} chunks, {len(context)} characters")
 
-        # 4. Adjust response settings based on question type
-        question_lower = question.lower()
-        
-        # For comprehensive requests, allow longer responses
-        if any(keyword in question_lower for keyword in [
-            'entire document', 'whole document', 'complete', 'full text', 'all content'
-        ]):
-            max_tokens = 4000  # Very long responses
-            temperature = 0.1  # More deterministic
-        elif any(keyword in question_lower for keyword in [
-            'mcq', 'multiple choice', 'list', 'points', 'steps', 'examples'
-        ]):
-            max_tokens = 2000  # Long structured responses
-            temperature = 0.2
-        elif 'summary' in question_lower or 'summarize' in question_lower:
-            max_tokens = 1500  # Comprehensive summaries
-            temperature = 0.3
-        else:
-            max_tokens = 800   # Regular answers
-            temperature = 0.3
+        # 4. Response settings come from the question's plan
+        max_tokens = plan.max_tokens
+        temperature = plan.temperature
 
         # 5. First try local AI (LM Studio)
         try:
@@ -138,29 +140,30 @@ IMPORTANT INSTRUCTIONS:
 - Always be complete and don't truncate your responses
 - Use clear formatting and structure your responses well"""
 
-            response = requests.post(
-                "http://localhost:1234/v1/chat/completions",
-                json={
-                    "model": "mistral",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {
-                            "role": "user",
-                            "content": f"""Document chunks:
+            with span("llm", provider="lmstudio"):
+                response = requests.post(
+                    LM_STUDIO_URL,
+                    json={
+                        "model": "mistral",
+                        "messages": [
+                            {"role": "system", "content": system_prompt},
+                            {
+                                "role": "user",
+                                "content": f"""Document chunks:
 {context}
 
 Question: {question}
 
 Provide a complete and comprehensive answer. Do not truncate or limit your response."""
-                        }
-                    ],
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": False
-                },
-                timeout=60  # Wait longer for big responses
-            )
-            response.raise_for_status()
+                            }
+                        ],
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                        "stream": False
+                    },
+                    timeout=60  # Wait longer for big responses
+                )
+                response.raise_for_status()
             answer = response.json()['choices'][0]['message']['content']
             logger.info(f"LM Studio response received, length: {len(answer)}")
             return {
@@ -177,13 +180,8 @@ Provide a complete and comprehensive answer. Do not truncate or limit your respo
         # 6. Fallback to Groq AI if local fails
         if groq_client:
             try:
-                # Use bigger model for complex requests
-                if any(keyword in question_lower for keyword in [
-                    'mcq', 'multiple choice', 'entire document', 'complete', 'full text', 'all content'
-                ]):
-                    model_name = "llama3-70b-8192"  # More powerful model
-                else:
-                    model_name = "llama3-8b-8192"   # Faster model
+                # Bigger model for complex requests, faster one otherwise
+                model_name = plan.groq_model
 
                 groq_prompt = f"""Based on the document chunks below, provide a comprehensive and complete answer to the question. 
 
@@ -201,12 +199,13 @@ Question: {question}
 
 Complete Answer:"""
 
-                groq_response = groq_client.chat.completions.create(
-                    model=model_name,
-                    messages=[{"role": "user", "content": groq_prompt}],
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
+                with span("llm", provider="groq"):
+                    groq_response = groq_client.chat.completions.create(
+                        model=model_name,
+                        messages=[{"role": "user", "content": groq_prompt}],
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
                 answer = groq_response.choices[0].message.content
                 logger.info(f"Groq response received, length: {len(answer)}")
                 return {
@@ -222,24 +221,25 @@ Complete Answer:"""
         # 7. Final fallback - return raw context if AI fails
         logger.warning("Both LLM services failed, returning comprehensive context")
         
-        # For full document requests, return all context
-        if any(keyword in question_lower for keyword in [
-            'entire document', 'whole document', 'complete', 'full text', 'all content'
-        ]):
-            return {
-                "answer": f"Here is the complete document content:\n\n{context}",
-                "sources": results['metadatas'][0],
-                "context_used": len(context_parts),
-                "model_used": "Direct Context (Full)"
-            }
-        else:
-            # For other requests, return partial context
-            return {
-                "answer": f"Based on the document, here are the relevant sections:\n\n{context[:3000]}{'...' if len(context) > 3000 else ''}",
-                "sources": results['metadatas'][0],
-                "context_used": len(context_parts),
-                "model_used": "Direct Context (Partial)"
-            }
+        llm_fallbacks.inc(kind="full" if plan.full_fallback else "partial")
+
+        with span("fallback"):
+            # For full document requests, return all context
+            if plan.full_fallback:
+                return {
+                    "answer": f"Here is the complete document content:\n\n{context}",
+                    "sources": results['metadatas'][0],
+                    "context_used": len(context_parts),
+                    "model_used": "Direct Context (Full)"
+                }
+            else:
+                # For other requests, return partial context
+                return {
+                    "answer": f"Based on the document, here are the relevant sections:\n\n{context[:3000]}{'...' if len(context) > 3000 else ''}",
+                    "sources": results['metadatas'][0],
+                    "context_used": len(context_parts),
+                    "model_used": "Direct Context (Partial)"
+                }
 
     except Exception as e:
         logger.error(f"Unexpected error in answer_query: {e}")
@@ -0,0 +1,308 @@
+import io
+import json
+import hashlib
+import zipfile
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from ..models import Document
+from . import vector_store
+from .local_index import local_index
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 'rag-snapshot'
+SNAPSHOT_VERSION = 1
+DTYPES = ('float16', 'float32')
+
+# Document columns carried in a snapshot
+DOCUMENT_FIELDS = ['id', 'title', 'file', 'file_size', 'file_type', 'page_count',
+                   'checksum', 'status', 'created_at', 'updated_at']
+
+
+class SnapshotError(Exception):
+    """Snapshot file is unreadable, corrupt or from an unsupported version"""
+
+
+class _ChecksummedZip:
+    """Writes zip entries and remembers each entry's SHA-256"""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.checksums = {}
+
+    def write(self, name, data):
+        self.checksums[name] = hashlib.sha256(data).hexdigest()
+        self.archive.writestr(name, data)
+
+
+def _json_bytes(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _document_row(doc, chunk_count):
+    row = {}
+    for field in DOCUMENT_FIELDS:
+        value = getattr(doc, field)
+        if field == 'file':
+            value = value.name
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        row[field] = value
+    row['chunk_count'] = chunk_count
+    return row
+
+
+def export_snapshot(path, since=None, dtype='float16', batch_size=5000, log=logger.info):
+    """
+    Write completed documents (changed at/after `since`, if given) with their
+    chunks and embeddings to a zip snapshot:
+
+      manifest.json                 format, version, counts, entry checksums
+      documents.json                Document rows + chunk counts
+      chunks/NNNNN/ids.json         one directory per batch of chunks, columnar:
+      chunks/NNNNN/documents.json     chunk texts
+      chunks/NNNNN/metadatas.json     chunk metadata
+      chunks/NNNNN/embeddings.npy     (n, dim) matrix in `dtype`
+    """
+    if dtype not in DTYPES:
+        raise SnapshotError(f"Unsupported dtype: {dtype}")
+
+    docs = Document.objects.filter(status='C').order_by('id')
+    if since is not None:
+        docs = docs.filter(updated_at__gte=since)
+
+    router = vector_store.router
+    document_rows = []
+    pending = {'ids': [], 'documents': [], 'metadatas': [], 'embeddings': []}
+    batches = 0
+    total_chunks = 0
+    dim = None
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        out = _ChecksummedZip(archive)
+
+        def flush():
+            nonlocal batches
+            prefix = f"chunks/{batches:05d}/"
+            out.write(prefix + 'ids.json', _json_bytes(pending['ids']))
+            out.write(prefix + 'documents.json', _json_bytes(pending['documents']))
+            out.write(prefix + 'metadatas.json', _json_bytes(pending['metadatas']))
+            out.write(prefix + 'embeddings.npy', _npy_bytes(np.asarray(pending['embeddings'], dtype=dtype)))
+            for values in pending.values():
+                values.clear()
+            batches += 1
+
+        for doc in docs.iterator():
+            collection = router.locate(doc.id)
+            if collection is None:
+                logger.warning(f"Document {doc.id} has no chunks, skipping")
+                continue
+            data = collection.get(where={"doc_id": str(doc.id)},
+                                  include=['documents', 'metadatas', 'embeddings'])
+            document_rows.append(_document_row(doc, len(data['ids'])))
+
+            for i, chunk_id in enumerate(data['ids']):
+                pending['ids'].append(chunk_id)
+                pending['documents'].append(data['documents'][i])
+                pending['metadatas'].append(data['metadatas'][i])
+                pending['embeddings'].append(data['embeddings'][i])
+            total_chunks += len(data['ids'])
+            if data['ids']:
+                dim = len(data['embeddings'][0])
+            if len(pending['ids']) >= batch_size:
+                flush()
+        if pending['ids']:
+            flush()
+
+        out.write('documents.json', _json_bytes(document_rows))
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'version': SNAPSHOT_VERSION,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'since': since.isoformat() if since else None,
+            'dtype': dtype,
+            'dim': dim,
+            'documents': len(document_rows),
+            'chunks': total_chunks,
+            'batches': batches,
+            'checksums': out.checksums,
+        }
+        # Manifest is not part of its own checksums
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+
+    log(f"Exported {len(document_rows)} documents, {total_chunks} chunks in {batches} batches")
+    return manifest
+
+
+def _open(path):
+    try:
+        return zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise SnapshotError(f"Not a snapshot: {path} is not a zip file")
+    except OSError as e:
+        raise SnapshotError(f"Cannot read snapshot {path}: {e}")
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read('manifest.json'))
+    except KeyError:
+        raise SnapshotError("Not a snapshot: manifest.json missing")
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise SnapshotError("Not a snapshot: unknown format")
+    if manifest.get('version', 0) > SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {manifest['version']} is newer than supported ({SNAPSHOT_VERSION})")
+    return manifest
+
+
+def _read_verified(archive, manifest, name):
+    try:
+        data = archive.read(name)
+    except (KeyError, zipfile.BadZipFile):
+        raise SnapshotError(f"Missing or damaged entry {name}")
+    expected = manifest['checksums'].get(name)
+    if expected is None or hashlib.sha256(data).hexdigest() != expected:
+        raise SnapshotError(f"Checksum mismatch for {name}")
+    return data
+
+
+def verify_snapshot(path):
+    """Check every entry against the manifest without importing anything"""
+    with _open(path) as archive:
+        manifest = read_manifest(archive)
+        for name in manifest['checksums']:
+            _read_verified(archive, manifest, name)
+    return manifest
+
+
+def _import_documents(rows, batch_size):
+    """Bulk upsert Document rows in one transaction, keeping their ids and created_at"""
+    objs = []
+    for row in rows:
+        # updated_at is left to auto_now: the rows did change on this node, which
+        # is what list ETags and later --since exports from here need to see
+        values = {f: row[f] for f in DOCUMENT_FIELDS if f != 'updated_at'}
+        values['created_at'] = datetime.fromisoformat(values['created_at'])
+        objs.append(Document(**values))
+
+    created = [obj.created_at for obj in objs]
+    update_fields = [f for f in DOCUMENT_FIELDS if f not in ('id', 'created_at')]
+    with transaction.atomic():
+        Document.objects.bulk_create(objs, batch_size=batch_size, update_conflicts=True,
+                                     unique_fields=['id'], update_fields=update_fields)
+
+        # auto_now_add overwrote created_at during bulk_create
+        for obj, created_at in zip(objs, created):
+            obj.created_at = created_at
+        Document.objects.bulk_update(objs, ['created_at'], batch_size=batch_size)
+
+        # Explicit ids leave the id sequence behind (PostgreSQL); reset it like loaddata does
+        statements = connection.ops.sequence_reset_sql(no_style(), [Document])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+def _replace_chunks(router, doc_id, chunks, tenant, batch_size):
+    """
+    Write one document's chunks to its partition, then remove any it had
+    before. The document always has a full set of chunks, old or new.
+    """
+    existing = router.locate(doc_id)
+    name = router.partition_for(doc_id, chunk_count=len(chunks['ids']), tenant=tenant)
+    collection = router.collection(name)
+    for start in range(0, len(chunks['ids']), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            ids=chunks['ids'][start:end],
+            documents=chunks['documents'][start:end],
+            metadatas=chunks['metadatas'][start:end],
+            embeddings=chunks['embeddings'][start:end],
+        )
+
+    if existing is not None:
+        if existing.name != name:
+            existing.delete(where={"doc_id": doc_id})
+        else:
+            new_ids = set(chunks['ids'])
+            old_ids = existing.get(where={"doc_id": doc_id}, include=[])['ids']
+            stale = [i for i in old_ids if i not in new_ids]
+            if stale:
+                existing.delete(ids=stale)
+    router.remember(doc_id, name)
+    if local_index is not None:
+        local_index.remove(doc_id)
+    return name
+
+
+def import_snapshot(path, batch_size=500, log=logger.info):
+    """
+    Load a snapshot: verify checksums, replace chunks one document at a time,
+    then upsert the Document rows in a single transaction.
+
+    Chunks go first so an interrupted import never leaves a completed
+    Document without chunks; running the import again finishes the job.
+    """
+    router = vector_store.router
+
+    with _open(path) as archive:
+        # Verify everything up front so a corrupt file changes nothing
+        manifest = read_manifest(archive)
+        for name in manifest['checksums']:
+            _read_verified(archive, manifest, name)
+
+        rows = json.loads(archive.read('documents.json'))
+        expected = {str(row['id']): row['chunk_count'] for row in rows}
+
+        # A document's chunks are contiguous but may span batches
+        pending = defaultdict(lambda: {'ids': [], 'documents': [], 'metadatas': [], 'embeddings': []})
+        tenants = {}
+        imported = Counter()
+
+        def flush(doc_id):
+            chunks = pending.pop(doc_id)
+            name = _replace_chunks(router, doc_id, chunks, tenants.get(doc_id), batch_size)
+            imported[name] += len(chunks['ids'])
+
+        for batch in range(manifest['batches']):
+            prefix = f"chunks/{batch:05d}/"
+            ids = json.loads(archive.read(prefix + 'ids.json'))
+            documents = json.loads(archive.read(prefix + 'documents.json'))
+            metadatas = json.loads(archive.read(prefix + 'metadatas.json'))
+            embeddings = np.load(io.BytesIO(archive.read(prefix + 'embeddings.npy')),
+                                 allow_pickle=False).astype(np.float32)
+
+            for i, meta in enumerate(metadatas):
+                doc_id = meta['doc_id']
+                chunks = pending[doc_id]
+                chunks['ids'].append(ids[i])
+                chunks['documents'].append(documents[i])
+                chunks['metadatas'].append(meta)
+                chunks['embeddings'].append(embeddings[i].tolist())
+                if meta.get('tenant'):
+                    tenants[doc_id] = meta['tenant']
+                if len(chunks['ids']) == expected.get(doc_id):
+                    flush(doc_id)
+
+        for doc_id in list(pending):
+            logger.warning(f"Document {doc_id} has fewer chunks than its row says, importing what is there")
+            flush(doc_id)
+
+        _import_documents(rows, batch_size)
+
+    log(f"Imported {len(rows)} documents, {sum(imported.values())} chunks "
+        f"into {len(imported)} partition(s)")
+    return manifest
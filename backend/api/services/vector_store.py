@@ -0,0 +1,171 @@
+import re
+import zlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMES = ('single', 'hash', 'tenant', 'size')
+
+# Size classes by chunk count: (name, upper bound); the last one is open-ended
+DEFAULT_SIZE_CLASSES = [('small', 50), ('medium', 500), ('large', None)]
+
+# Tenants become part of a collection name, which ChromaDB limits to 3-63 of [A-Za-z0-9_.-]
+# ending in a letter or digit
+TENANT_PATTERN = re.compile(r'^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,38}[A-Za-z0-9])?$')
+
+
+def is_valid_tenant(tenant):
+    return bool(TENANT_PATTERN.match(tenant or ''))
+
+
+class PartitionRouter:
+    """
+    Decides which ChromaDB collection holds a document, for both ingest and query.
+
+    Schemes:
+      single - everything in "<prefix>" (the original layout)
+      hash   - "<prefix>_hNN", NN = crc32(doc_id) % shards
+      tenant - "<prefix>_t_<tenant>", untenanted documents in "<prefix>_t_default"
+      size   - "<prefix>_s_<class>" by chunk count at ingest time
+
+    Hash/single are computed directly. Tenant/size placements are found with a
+    parallel fan-out over the partitions and then remembered.
+    """
+
+    def __init__(self, client, scheme='single', prefix='documents', shards=8,
+                 size_classes=None, max_workers=8):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown partitioning scheme: {scheme}")
+        self.client = client
+        self.scheme = scheme
+        self.prefix = prefix
+        self.shards = shards
+        self.size_classes = size_classes or DEFAULT_SIZE_CLASSES
+        self.max_workers = max_workers
+        self._collections = {}
+        self._locations = {}  # doc_id -> partition name, for fan-out schemes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, client):
+        config = getattr(settings, 'VECTOR_PARTITIONING', {})
+        return cls(
+            client,
+            scheme=config.get('SCHEME', 'single'),
+            prefix=config.get('PREFIX', 'documents'),
+            shards=config.get('SHARDS', 8),
+            size_classes=config.get('SIZE_CLASSES'),
+            max_workers=config.get('MAX_WORKERS', 8),
+        )
+
+    def collection(self, name):
+        """Cached get_or_create for a partition"""
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = self.client.get_or_create_collection(name)
+            return self._collections[name]
+
+    def drop(self, name):
+        """Delete a partition's collection"""
+        self.client.delete_collection(name)
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def partition_names(self):
+        """Every partition that may hold documents under the current scheme"""
+        if self.scheme == 'single':
+            return [self.prefix]
+        if self.scheme == 'hash':
+            return [f"{self.prefix}_h{i:02d}" for i in range(self.shards)]
+        if self.scheme == 'size':
+            return [f"{self.prefix}_s_{name}" for name, _ in self.size_classes]
+        # Tenants are open-ended, so look at what exists
+        tenant_prefix = f"{self.prefix}_t_"
+        return sorted(c.name for c in self.client.list_collections() if c.name.startswith(tenant_prefix))
+
+    def partition_for(self, doc_id, chunk_count=None, tenant=None):
+        """Partition a document should be written to"""
+        if self.scheme == 'single':
+            return self.prefix
+        if self.scheme == 'hash':
+            return f"{self.prefix}_h{zlib.crc32(str(doc_id).encode()) % self.shards:02d}"
+        if self.scheme == 'tenant':
+            if tenant and not is_valid_tenant(tenant):
+                raise ValueError(f"Invalid tenant: {tenant!r}")
+            return f"{self.prefix}_t_{tenant or 'default'}"
+        for name, upper in self.size_classes:
+            if upper is None or (chunk_count or 0) <= upper:
+                return f"{self.prefix}_s_{name}"
+        return f"{self.prefix}_s_{self.size_classes[-1][0]}"
+
+    def fan_out(self, fn, names=None):
+        """Run fn(collection) on every partition in parallel, returning {name: result}"""
+        names = self.partition_names() if names is None else names
+        if not names:
+            return {}
+        if len(names) == 1:
+            return {names[0]: fn(self.collection(names[0]))}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as pool:
+            results = pool.map(lambda name: fn(self.collection(name)), names)
+            return dict(zip(names, results))
+
+    def locate(self, doc_id):
+        """Collection holding doc_id's chunks, or None if it is nowhere"""
+        key = str(doc_id)
+        if self.scheme in ('single', 'hash'):
+            collection = self.collection(self.partition_for(doc_id))
+            return collection if self._has_doc(collection, key) else None
+
+        # Another process (reshard, snapshot import) may have moved it since
+        name = self._locations.get(key)
+        if name is not None:
+            collection = self.collection(name)
+            if self._has_doc(collection, key):
+                return collection
+            self._locations.pop(key, None)
+
+        found = self.fan_out(lambda c: self._has_doc(c, key))
+        for name, has_doc in found.items():
+            if has_doc:
+                self._locations[key] = name
+                return self.collection(name)
+        return None
+
+    def remember(self, doc_id, name):
+        self._locations[str(doc_id)] = name
+
+    def move(self, doc_id, source, target_name, batch_size=1000):
+        """Copy a document's chunks from source into target_name, then delete them from source"""
+        key = str(doc_id)
+        target = self.collection(target_name)
+        offset = 0
+        while True:
+            data = source.get(where={"doc_id": key}, include=['documents', 'metadatas', 'embeddings'],
+                              limit=batch_size, offset=offset)
+            if not data['ids']:
+                break
+            target.upsert(
+                ids=data['ids'],
+                documents=data['documents'],
+                metadatas=data['metadatas'],
+                embeddings=data['embeddings'],
+            )
+            offset += len(data['ids'])
+        source.delete(where={"doc_id": key})
+        self.remember(doc_id, target_name)
+        return target
+
+    @staticmethod
+    def _has_doc(collection, doc_id):
+        return bool(collection.get(where={"doc_id": doc_id}, limit=1, include=[])['ids'])
+
+
+# One client for the process; ingest and query share the router
+client = chromadb.PersistentClient(path=getattr(settings, 'CHROMA_DB_PATH', "E:/ragproj/chromadb_data"))
+router = PartitionRouter.from_settings(client)
+logger.info(f"Vector storage partitioning: {router.scheme}")
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Document
+from .pagination import record_document_deletion
+
+
+# Deletions don't move Document.updated_at, so count them for the list version
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, **kwargs):
+    record_document_deletion()
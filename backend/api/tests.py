@@ -1,3 +1,744 @@
-from django.test import TestCase
+import io
+import os
+import time
+import hashlib
+import zipfile
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
+
+from .services.intent import IntentClassifier, DEFAULT_INTENTS, classify_question
+from .models import Document
+from .benchmarks.corpus import generate_corpus
+from .benchmarks.runner import summarize
+from .benchmarks.stub_llm import StubLLMServer
+from .upload_handlers import StreamingDocumentUploadHandler, sniff_file_type
+from .services.local_index import LocalVectorIndex
+from .services.vector_store import PartitionRouter
+from .services.extractors import docx_records, txt_records, detect_encoding, extract_records
+from .services.snapshot import SnapshotError, export_snapshot, import_snapshot, verify_snapshot
+from .services.metrics import Histogram, StageTotals, span, start_request_timings, stop_request_timings, render_metrics
+
+
+# One fixture per intent: questions that must land on it
+INTENT_FIXTURES = {
+    "full_document": [
+        "Show me the entire document",
+        "Give me the full   text please",
+        "Print the complete document",
+    ],
+    "mcq": [
+        "Make 10 MCQs from chapter 2",
+        "Create 5 multiple choice questions",
+    ],
+    "summary": [
+        "Summarize this report",
+        "Give me an overview",
+        "Write a short summary",
+    ],
+    "list": [
+        "List the steps to configure a VPC",
+        "What are the main points?",
+        "Give some examples of subnets",
+        "Give me a complete list of steps",
+    ],
+    "long_answer": [
+        "Is the installation complete?",
+        "Does everything need a subnet?",
+        "Give the complete answer",
+    ],
+    "default": [
+        "What is a VPC?",
+        "Who wrote the incomplete draft?",
+        "",
+    ],
+}
+
+
+class IntentClassifierTests(SimpleTestCase):
+    def setUp(self):
+        self.classifier = IntentClassifier(DEFAULT_INTENTS)
+
+    def test_fixtures(self):
+        for intent, questions in INTENT_FIXTURES.items():
+            for question in questions:
+                with self.subTest(question=question):
+                    self.assertEqual(self.classifier.classify(question).intent, intent)
+
+    def test_mcq_gets_bigger_model_and_more_chunks(self):
+        plan = self.classifier.classify("10 mcq on networking")
+        self.assertEqual(plan.max_chunks, 20)
+        self.assertEqual(plan.groq_model, "llama3-70b-8192")
+        self.assertFalse(plan.fetch_all)
+
+    def test_full_document_plan(self):
+        plan = self.classifier.classify("whole document please")
+        self.assertTrue(plan.fetch_all)
+        self.assertTrue(plan.full_fallback)
+        self.assertEqual(plan.max_tokens, 4000)
+
+    def test_complete_does_not_fetch_all(self):
+        for question in ("Is the installation complete?", "Give me a complete list of steps",
+                         "Does everything need a subnet?"):
+            with self.subTest(question=question):
+                self.assertFalse(self.classifier.classify(question).fetch_all)
+        self.assertEqual(self.classifier.classify("Is the installation complete?").max_tokens, 4000)
+
+    def test_default_plan(self):
+        plan = classify_question("What is a subnet?")
+        self.assertEqual(plan.intent, "default")
+        self.assertEqual(plan.max_chunks, 15)
+        self.assertEqual(plan.max_tokens, 800)
+
+    def test_custom_intents(self):
+        classifier = IntentClassifier([
+            {"name": "code", "keywords": ["snippet"], "plan": {"max_tokens": 1234}},
+        ])
+        self.assertEqual(classifier.classify("show a snippet").max_tokens, 1234)
+        self.assertEqual(classifier.classify("summary").intent, "default")
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        hist = Histogram("test_seconds", "test", ["stage"], buckets=(0.1, 1.0))
+        hist.observe(0.05, stage="a")
+        hist.observe(0.5, stage="a")
+        text = "\n".join(hist.render())
+        self.assertIn('test_seconds_bucket{stage="a",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="a",le="1.0"} 2', text)
+        self.assertIn('test_seconds_bucket{stage="a",le="+Inf"} 2', text)
+        self.assertIn('test_seconds_count{stage="a"} 2', text)
+
+    def test_span_records_request_timings(self):
+        start_request_timings()
+        with span("retrieve"):
+            pass
+        with span("llm", provider="groq"):
+            pass
+        timings = stop_request_timings()
+        self.assertEqual(set(timings), {"retrieve", "llm:groq"})
+
+    def test_span_counts_errors(self):
+        with self.assertRaises(ValueError):
+            with span("extract_test"):
+                raise ValueError("boom")
+        self.assertIn('rag_stage_errors_total{stage="extract_test",provider=""} 1', render_metrics())
+
+    def test_direct_context_fallback_is_timed(self):
+        from .services import rag
+        results = {"documents": [["VPCs isolate networks."]], "metadatas": [[{"chunk_index": 0}]]}
+        with mock.patch.object(rag.vector_store.router, "locate", return_value=FakeCollection("documents")), \
+                mock.patch.object(rag, "get_document_chunks_for_query", return_value=results), \
+                mock.patch.object(rag.requests, "post", side_effect=requests.ConnectionError), \
+                mock.patch.object(rag, "groq_client", None), \
+                mock.patch.object(rag, "local_index", None):
+            start_request_timings()
+            response = rag.answer_query(1, "What is a VPC?")
+            timings = stop_request_timings()
+        self.assertEqual(response["model_used"], "Direct Context (Partial)")
+        self.assertIn("fallback", timings)
+
+    def test_stage_totals_exclude_nested_time(self):
+        stages = StageTotals()
+
+        def produce():
+            for i in range(3):
+                time.sleep(0.01)
+                yield i
+
+        items = list(stages.timed(stages.timed(produce(), "extract"), "chunk"))
+        self.assertEqual(items, [0, 1, 2])
+        self.assertGreaterEqual(stages.seconds["extract"], 0.03)
+        self.assertLess(stages.seconds["chunk"], 0.01)
+
+    def test_no_timings_outside_request(self):
+        with span("chunk"):
+            pass
+        self.assertEqual(stop_request_timings(), {})
+
+
+class BenchmarkHelperTests(SimpleTestCase):
+    def test_summarize(self):
+        stats = summarize([0.1, 0.2, 0.3, 0.4], wall_seconds=2.0, units=1000)
+        self.assertEqual(stats["count"], 4)
+        self.assertEqual(stats["p50_ms"], 200.0)
+        self.assertEqual(stats["max_ms"], 400.0)
+        self.assertEqual(stats["ops_per_s"], 2.0)
+        self.assertEqual(stats["units_per_s"], 500.0)
+
+    def test_corpus_is_reproducible(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            first = generate_corpus(a, docs_per_type=2, pages=2, file_types=("txt",))
+            second = generate_corpus(b, docs_per_type=2, pages=2, file_types=("txt",))
+            self.assertEqual(len(first), 2)
+            for x, y in zip(first, second):
+                with open(x) as fx, open(y) as fy:
+                    self.assertEqual(fx.read(), fy.read())
+            self.assertGreater(os.path.getsize(first[0]), 1000)
+
+    def test_stub_llm_speaks_chat_completions(self):
+        with StubLLMServer(answer="hello") as stub:
+            response = requests.post(stub.lm_studio_url, json={"model": "mistral", "messages": []}, timeout=5)
+        self.assertEqual(response.json()["choices"][0]["message"]["content"], "hello")
+
+
+class StreamingUploadHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.override = override_settings(MEDIA_ROOT=self.media.name)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def upload(self, name, content, max_size=None):
+        request = RequestFactory().post("/api/upload/", {"file": SimpleUploadedFile(name, content)})
+        handler = StreamingDocumentUploadHandler(request, max_size=max_size)
+        request.upload_handlers = [handler]
+        return handler, request.FILES.get("file")
+
+    def test_streams_to_media_with_checksum(self):
+        content = b"Plain text document. " * 1000
+        handler, file_obj = self.upload("notes.txt", content)
+        self.assertIsNone(handler.error)
+        self.assertEqual(file_obj.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(file_obj.sniffed_type, "txt")
+        self.assertEqual(file_obj.storage_name, "documents/notes.txt")
+        self.assertEqual(file_obj.read(), content)
+        file_obj.close()
+        self.assertTrue(os.path.exists(os.path.join(self.media.name, "documents", "notes.txt")))
+
+    def test_size_limit(self):
+        handler, file_obj = self.upload("big.txt", b"x" * 5000, max_size=1000)
+        self.assertIsNone(file_obj)
+        self.assertEqual(handler.error_status, 413)
+        self.assertEqual(os.listdir(os.path.join(self.media.name, "documents")), [])
+
+    def test_content_must_match_extension(self):
+        handler, file_obj = self.upload("fake.pdf", b"just text, no pdf header")
+        self.assertIsNone(file_obj)
+        self.assertEqual(handler.error_status, 400)
+        self.assertEqual(os.listdir(os.path.join(self.media.name, "documents")), [])
+
+    def test_sniff_file_type(self):
+        self.assertEqual(sniff_file_type(b"%PDF-1.7\n"), "pdf")
+        self.assertEqual(sniff_file_type(b"PK\x03\x04rest"), "docx")
+        self.assertEqual(sniff_file_type(b"hello"), "txt")
+        self.assertIsNone(sniff_file_type(b"\x00\x01binary"))
+        self.assertEqual(sniff_file_type("hello".encode("utf-16")), "txt")
+        self.assertEqual(sniff_file_type("hello".encode("utf-32")), "txt")
+
+    def test_utf16_text_upload(self):
+        content = "Grüße aus dem Netz.\n\nZweiter Absatz.".encode("utf-16")
+        handler, file_obj = self.upload("notes.txt", content)
+        self.assertIsNone(handler.error)
+        self.assertEqual(file_obj.sniffed_type, "txt")
+        self.assertEqual(list(txt_records(file_obj.path, file_obj.file)),
+                         ["Grüße aus dem Netz.", "Zweiter Absatz."])
+        file_obj.close()
+
+    def test_invalid_tenant_is_rejected(self):
+        for tenant in ("Acme Corp", "acme/eu", "a" * 41, "-acme", "acme-", "acme_"):
+            with self.subTest(tenant=tenant):
+                response = self.client.post("/api/upload/", {
+                    "file": SimpleUploadedFile("notes.txt", b"Plain text"), "tenant": tenant,
+                })
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("tenant", response.json()["error"])
+        self.assertEqual(os.listdir(os.path.join(self.media.name, "documents")), [])
+
+
+class UploadViewTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.override = override_settings(MEDIA_ROOT=self.media.name)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def test_session_user_upload_is_streamed(self):
+        # DRF's CSRF check reads request.POST for session-authenticated users
+        from django.contrib.auth.models import User
+        from django.test import Client
+
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        token = "a" * 32
+        client.cookies["csrftoken"] = token
+        with mock.patch("api.views.process_document", return_value=(True, 1)) as process:
+            response = client.post("/api/upload/", {
+                "file": SimpleUploadedFile("notes.txt", b"Plain text document."),
+                "csrfmiddlewaretoken": token,
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Document.objects.get().checksum, hashlib.sha256(b"Plain text document.").hexdigest())
+        process.assert_called_once()
+
+        # Still subject to the handler's checks
+        response = client.post("/api/upload/", {
+            "file": SimpleUploadedFile("fake.pdf", b"not a pdf"), "csrfmiddlewaretoken": token,
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class DocumentListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            Document.objects.create(
+                title=f"doc{i}.txt", file=f"documents/doc{i}.txt", file_size=100,
+                file_type="txt", status="C" if i % 2 == 0 else "F",
+            )
+
+    def test_cursor_pagination(self):
+        response = self.client.get("/api/documents/", {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["count"], 5)
+        self.assertEqual([d["title"] for d in body["results"]], ["doc4.txt", "doc3.txt"])
+        self.assertIsNotNone(body["next"])
+
+        titles = [d["title"] for d in body["results"]]
+        while body["next"]:
+            body = self.client.get(body["next"]).json()
+            titles += [d["title"] for d in body["results"]]
+        self.assertEqual(titles, [f"doc{i}.txt" for i in range(4, -1, -1)])
+
+    def test_status_filter_and_fields(self):
+        body = self.client.get("/api/documents/", {"status": "C", "fields": "id,title"}).json()
+        self.assertEqual(body["count"], 3)
+        self.assertEqual(set(body["results"][0]), {"id", "title"})
+
+    def test_bad_params(self):
+        self.assertEqual(self.client.get("/api/documents/", {"status": "X"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/documents/", {"fields": "file"}).status_code, 400)
+
+    def test_conditional_get(self):
+        etag = self.client.get("/api/documents/").headers["ETag"]
+        response = self.client.get("/api/documents/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Any change to a document invalidates the ETag and cached count
+        Document.objects.filter(status="F").first().delete()
+        response = self.client.get("/api/documents/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 4)
+
+    def test_polling_is_cheap(self):
+        etag = self.client.get("/api/documents/").headers["ETag"]
+        # Newest updated_at + deletion counter, nothing else
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/documents/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Version read once, count from cache, one page query
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get("/api/documents/").status_code, 200)
+
+    def test_etag_follows_database_not_signals(self):
+        # Writes from another process (or bulk writes) send no signals to this one
+        etag = self.client.get("/api/documents/").headers["ETag"]
+        Document.objects.bulk_create([Document(title="bulk.txt", file="documents/bulk.txt",
+                                               file_size=1, file_type="txt", status="C")])
+        response = self.client.get("/api/documents/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 6)
+
+        etag = response.headers["ETag"]
+        doc = Document.objects.get(title="bulk.txt")
+        doc.title = "renamed.txt"
+        doc.save()
+        self.assertNotEqual(self.client.get("/api/documents/").headers["ETag"], etag)
+
+
+class LocalVectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+
+    def add_doc(self, index, doc_id, vectors):
+        index.add(doc_id, vectors, [f"text {i}" for i in range(len(vectors))],
+                  [{"doc_id": str(doc_id), "chunk_index": i} for i in range(len(vectors))])
+
+    def test_top_k_matches_brute_force(self):
+        index = LocalVectorIndex(self.root.name, memory_budget=10 * 1024 * 1024)
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((50, 8))
+        self.add_doc(index, 7, vectors)
+
+        query = rng.standard_normal(8)
+        results = index.query(7, query, 5)
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = list(np.argsort(-(unit @ query))[:5])
+        self.assertEqual([m["chunk_index"] for m in results["metadatas"][0]], expected)
+        self.assertEqual(results["distances"][0], sorted(results["distances"][0]))
+
+    def test_miss_and_remove(self):
+        index = LocalVectorIndex(self.root.name, memory_budget=10 * 1024 * 1024)
+        self.assertIsNone(index.query(1, [1.0, 0.0], 3))
+        self.add_doc(index, 1, [[1.0, 0.0], [0.0, 1.0]])
+        self.assertIn(1, index)
+        self.assertEqual(len(index.get(1)["documents"]), 2)
+        index.remove(1)
+        self.assertNotIn(1, index)
+        self.assertIsNone(index.get(1))
+
+    def test_lru_eviction_by_budget(self):
+        vectors = np.ones((100, 16))  # ~7 KB per doc with the chunk texts
+        index = LocalVectorIndex(self.root.name, memory_budget=22000)
+        for doc_id in range(3):
+            self.add_doc(index, doc_id, vectors)
+            index.query(doc_id, vectors[0], 1)
+        index.query(0, vectors[0], 1)  # 0 becomes most recent
+        self.add_doc(index, 3, vectors)
+        index.query(3, vectors[0], 1)
+        self.assertEqual(list(index._entries), ["2", "0", "3"])
+        self.assertLessEqual(index._loaded_bytes, 22000)
+
+    def test_sees_changes_from_another_process(self):
+        reader = LocalVectorIndex(self.root.name, memory_budget=10 * 1024 * 1024)
+        writer = LocalVectorIndex(self.root.name, memory_budget=10 * 1024 * 1024)
+        self.add_doc(writer, 1, [[1.0, 0.0], [0.0, 1.0]])
+        self.assertEqual(len(reader.get(1)["documents"]), 2)
+
+        self.add_doc(writer, 1, [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+        self.assertEqual(len(reader.get(1)["documents"]), 3)
+        writer.remove(1)
+        self.assertIsNone(reader.query(1, [1.0, 0.0], 3))
+
+
+class FakeCollection:
+    """Just enough of a ChromaDB collection for routing and snapshot tests"""
+
+    def __init__(self, name):
+        self.name = name
+        self.doc_ids = set()
+        self.rows = {}  # chunk id -> (document, metadata, embedding)
+
+    def get(self, where=None, limit=None, offset=0, include=None):
+        if not self.rows:
+            ids = ["x"] if where and where["doc_id"] in self.doc_ids else []
+            return {"ids": ids}
+        ids = [i for i, (_, meta, _) in self.rows.items() if not where or meta["doc_id"] == where["doc_id"]]
+        ids = ids[offset:offset + limit] if limit else ids[offset:]
+        return {
+            "ids": ids,
+            "documents": [self.rows[i][0] for i in ids],
+            "metadatas": [self.rows[i][1] for i in ids],
+            "embeddings": [self.rows[i][2] for i in ids],
+        }
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for row in zip(ids, documents, metadatas, embeddings):
+            self.rows[row[0]] = row[1:]
+            self.doc_ids.add(row[2]["doc_id"])
+
+    def add(self, **kwargs):
+        self.upsert(**kwargs)
+
+    def delete(self, where=None, ids=None):
+        if ids is not None:
+            self.rows = {i: row for i, row in self.rows.items() if i not in ids}
+            return
+        self.rows = {i: row for i, row in self.rows.items() if row[1]["doc_id"] != where["doc_id"]}
+        self.doc_ids.discard(where["doc_id"])
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    def list_collections(self):
+        return list(self.collections.values())
+
+
+class PartitionRouterTests(SimpleTestCase):
+    def test_single_keeps_original_collection(self):
+        router = PartitionRouter(FakeClient())
+        self.assertEqual(router.partition_for(1, chunk_count=10_000), "documents")
+
+    def test_hash_is_stable_and_bounded(self):
+        router = PartitionRouter(FakeClient(), scheme="hash", shards=4)
+        names = {router.partition_for(doc_id) for doc_id in range(200)}
+        self.assertEqual(names, set(router.partition_names()))
+        self.assertEqual(router.partition_for(42), router.partition_for("42"))
+
+    def test_size_and_tenant(self):
+        router = PartitionRouter(FakeClient(), scheme="size")
+        self.assertEqual(router.partition_for(1, chunk_count=10), "documents_s_small")
+        self.assertEqual(router.partition_for(1, chunk_count=400), "documents_s_medium")
+        self.assertEqual(router.partition_for(1, chunk_count=9000), "documents_s_large")
+        router = PartitionRouter(FakeClient(), scheme="tenant")
+        self.assertEqual(router.partition_for(1, tenant="acme"), "documents_t_acme")
+        self.assertEqual(router.partition_for(1), "documents_t_default")
+        with self.assertRaises(ValueError):
+            router.partition_for(1, tenant="acme/eu")
+
+    def test_locate_fans_out_and_remembers(self):
+        client = FakeClient()
+        router = PartitionRouter(client, scheme="size")
+        router.collection("documents_s_medium").doc_ids.add("7")
+        self.assertEqual(router.locate(7).name, "documents_s_medium")
+        self.assertEqual(router._locations["7"], "documents_s_medium")
+        self.assertIsNone(router.locate(8))
+
+    def test_locate_rechecks_remembered_partition(self):
+        router = PartitionRouter(FakeClient(), scheme="size")
+        router.collection("documents_s_small").doc_ids.add("7")
+        self.assertEqual(router.locate(7).name, "documents_s_small")
+        # Moved by another process
+        router.collection("documents_s_small").doc_ids.discard("7")
+        router.collection("documents_s_large").doc_ids.add("7")
+        self.assertEqual(router.locate(7).name, "documents_s_large")
+
+
+class StreamingExtractorTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_docx_keeps_order_headings_and_tables(self):
+        from docx import Document as DocxDocument
+
+        doc = DocxDocument()
+        doc.add_heading("Networking", level=1)
+        doc.add_paragraph("Intro paragraph.")
+        table = doc.add_table(rows=2, cols=2)
+        table.cell(0, 0).text, table.cell(0, 1).text = "Port", "Service"
+        table.cell(1, 0).text, table.cell(1, 1).text = "443", "HTTPS"
+        doc.add_heading("Details", level=2)
+        doc.add_paragraph("After the table.")
+        path = os.path.join(self.dir.name, "sample.docx")
+        doc.save(path)
+
+        records = docx_records(path)
+        self.assertEqual(list(records), [
+            "# Networking", "Intro paragraph.", "Port | Service", "443 | HTTPS",
+            "## Details", "After the table.",
+        ])
+        self.assertEqual(records.page_count, 1)
+
+    def test_docx_nested_table_appears_once(self):
+        from docx import Document as DocxDocument
+
+        doc = DocxDocument()
+        table = doc.add_table(rows=1, cols=2)
+        table.cell(0, 0).text = "Region"
+        cell = table.cell(0, 1)
+        cell.text = "Zones"
+        inner = cell.add_table(rows=1, cols=2)
+        inner.cell(0, 0).text, inner.cell(0, 1).text = "us-east-1a", "us-east-1b"
+        path = os.path.join(self.dir.name, "nested.docx")
+        doc.save(path)
+
+        self.assertEqual(list(docx_records(path)), ["Region | Zones", "us-east-1a | us-east-1b"])
+
+    def test_txt_paragraphs_across_read_blocks(self):
+        path = os.path.join(self.dir.name, "big.txt")
+        paragraphs = [f"Paragraph {i} " + "word " * 30 for i in range(50)]
+        with open(path, "w", encoding="utf-16") as f:
+            f.write("\n\n".join(paragraphs))
+
+        records = txt_records(path, read_size=97)  # Tiny reads to cross boundaries
+        self.assertEqual([r.strip() for r in records], [p.strip() for p in paragraphs])
+        self.assertEqual(records.word_count, 50 * 32)
+
+    def test_txt_from_open_file(self):
+        path = os.path.join(self.dir.name, "latin.txt")
+        with open(path, "wb") as f:
+            f.write("Caf\xe9 na\xefve r\xe9sum\xe9.".encode("cp1252"))
+        with open(path, "rb") as f:
+            records = list(extract_records(path, f))
+            self.assertFalse(f.closed)
+        self.assertIn("Caf\xe9", records[0])
+
+    def test_detect_encoding(self):
+        self.assertEqual(detect_encoding("abc".encode("utf-8-sig")), "utf-8-sig")
+        self.assertEqual(detect_encoding("h\xe9llo w\xf6rld".encode("utf-8")), "utf-8")
+        # Multi-byte characters near the end of a whole file
+        self.assertEqual(detect_encoding(("a" * 100 + "\xe9ab").encode()), "utf-8")
+        self.assertEqual(detect_encoding(("x" + "Gr\xfc\xdfe!").encode()), "utf-8")
+        # A sample cut mid-character is still UTF-8, a complete file ending that way is not
+        cut = "caf\xe9".encode()[:-1]
+        self.assertEqual(detect_encoding(cut, truncated=True), "utf-8")
+        self.assertNotEqual(detect_encoding(cut), "utf-8")
+
+
+class StreamedIngestTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "big.txt")
+        with open(self.path, "w", encoding="utf-8") as f:
+            for i in range(300):
+                f.write(f"Paragraph {i} talks about subnets and routing tables in some detail. " * 3 + "\n\n")
+
+        from .services import processor
+        self.processor = processor
+        self.router = PartitionRouter(FakeClient(), scheme="size", size_classes=[("small", 5), ("large", None)])
+        self.encoded = []
+
+        def encode(batch):
+            self.encoded.append(len(batch))
+            return np.ones((len(batch), 4))
+
+        for patcher in (mock.patch.object(processor.vector_store, "router", self.router),
+                        mock.patch.object(processor, "model", mock.Mock(encode=encode)),
+                        mock.patch.object(processor, "EMBED_BATCH_SIZE", 4),
+                        mock.patch.object(processor, "local_index", None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_embeds_and_stores_in_batches(self):
+        start_request_timings()
+        success, _ = self.processor.process_document(self.path, 9)
+        timings = stop_request_timings()
+
+        self.assertTrue(success)
+        self.assertGreater(len(self.encoded), 1)
+        self.assertTrue(all(n <= 4 for n in self.encoded))
+        self.assertEqual(set(timings), {"extract", "chunk", "embed", "store"})
+
+        # Started in "small" from the first batch, moved once the total was known
+        stored = self.router.collection("documents_s_large").get(where={"doc_id": "9"})
+        self.assertEqual(len(stored["ids"]), sum(self.encoded))
+        self.assertEqual(self.router.collection("documents_s_small").rows, {})
+        self.assertEqual(self.router.locate(9).name, "documents_s_large")
+
+    def test_failed_store_leaves_no_chunks(self):
+        collection = self.router.collection("documents_s_small")
+        original_add = collection.add
+        calls = []
+
+        def flaky_add(**kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("disk full")
+            original_add(**kwargs)
+
+        collection.add = flaky_add
+        success, _ = self.processor.process_document(self.path, 9)
+        self.assertFalse(success)
+        self.assertEqual(collection.rows, {})
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "snap.zip")
+        self.router = PartitionRouter(FakeClient())
+        patcher = mock.patch("api.services.vector_store.router", self.router)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _ingest(self, title, chunks):
+        doc = Document.objects.create(title=title, file=f"documents/{title}", file_size=1,
+                                      file_type="txt", status="C")
+        rng = np.random.default_rng(doc.id)
+        self.router.collection("documents").upsert(
+            ids=[f"{doc.id}_{i}" for i in range(chunks)],
+            documents=[f"{title} chunk {i}" for i in range(chunks)],
+            metadatas=[{"doc_id": str(doc.id), "chunk_index": i} for i in range(chunks)],
+            embeddings=rng.random((chunks, 8)).tolist(),
+        )
+        return doc
+
+    def test_round_trip_restores_rows_and_chunks(self):
+        first = self._ingest("a.txt", 3)
+        self._ingest("b.txt", 5)
+        manifest = export_snapshot(self.path, dtype="float32", batch_size=2, log=lambda msg: None)
+        self.assertEqual((manifest["documents"], manifest["chunks"], manifest["batches"]), (2, 8, 2))
+        created_at = first.created_at
+
+        Document.objects.all().delete()
+        self.router = PartitionRouter(FakeClient(), scheme="hash", shards=2)
+        with mock.patch("api.services.vector_store.router", self.router):
+            import_snapshot(self.path, batch_size=2, log=lambda msg: None)
+            restored = Document.objects.get(id=first.id)
+            self.assertEqual(restored.created_at, created_at)
+            self.assertEqual(Document.objects.count(), 2)
+            data = self.router.locate(first.id).get(where={"doc_id": str(first.id)})
+            self.assertEqual(sorted(data["documents"]), [f"a.txt chunk {i}" for i in range(3)])
+
+        # The id sequence continues past imported ids
+        later = Document.objects.create(title="c.txt", file="documents/c.txt", file_size=1, file_type="txt")
+        self.assertGreater(later.id, max(Document.objects.exclude(id=later.id).values_list("id", flat=True)))
+
+    def test_incremental_export_and_reimport_replaces_chunks(self):
+        old = self._ingest("old.txt", 2)
+        Document.objects.filter(id=old.id).update(updated_at=timezone.now() - timedelta(days=2))
+        new = self._ingest("new.txt", 2)
+        manifest = export_snapshot(self.path, since=timezone.now() - timedelta(days=1), log=lambda msg: None)
+        self.assertEqual(manifest["documents"], 1)
+
+        # Stale extra chunk for the same document is dropped on import
+        self.router.collection("documents").upsert(ids=["stale"], documents=["stale"],
+                                                   metadatas=[{"doc_id": str(new.id)}], embeddings=[[0.0] * 8])
+        import_snapshot(self.path, log=lambda msg: None)
+        data = self.router.collection("documents").get(where={"doc_id": str(new.id)})
+        self.assertNotIn("stale", data["ids"])
+        self.assertEqual(len(data["ids"]), 2)
+
+    def test_corrupt_snapshot_is_rejected(self):
+        self._ingest("a.txt", 2)
+        export_snapshot(self.path, log=lambda msg: None)
+        with zipfile.ZipFile(self.path) as archive:
+            entries = {name: archive.read(name) for name in archive.namelist()}
+        entries["documents.json"] = entries["documents.json"].replace(b"a.txt", b"x.txt")
+        with zipfile.ZipFile(self.path, "w") as archive:
+            for name, data in entries.items():
+                archive.writestr(name, data)
+        with self.assertRaises(SnapshotError):
+            verify_snapshot(self.path)
+        with self.assertRaises(SnapshotError):
+            import_snapshot(self.path, log=lambda msg: None)
+
+    def test_export_command_since_without_offset(self):
+        old = self._ingest("old.txt", 2)
+        Document.objects.filter(id=old.id).update(updated_at=timezone.now() - timedelta(days=2))
+        self._ingest("new.txt", 2)
+        since = (timezone.now() - timedelta(days=1)).replace(tzinfo=None).isoformat(timespec="seconds")
+        out = io.StringIO()
+        call_command("snapshot", "export", self.path, "--since", since, stdout=out)
+        self.assertIn("Export OK: 1 documents", out.getvalue())
+
+    def test_not_a_zip(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot")
+        with self.assertRaises(SnapshotError):
+            verify_snapshot(self.path)
+        with self.assertRaises(CommandError):
+            call_command("snapshot", "import", self.path, stdout=io.StringIO())
+
+    def test_failed_import_keeps_existing_chunks_and_rows(self):
+        self._ingest("a.txt", 2)
+        second = self._ingest("b.txt", 2)
+        export_snapshot(self.path, log=lambda msg: None)
+        Document.objects.all().delete()
+
+        collection = self.router.collection("documents")
+        original_upsert = collection.upsert
+        calls = []
+
+        def flaky_upsert(**kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("chroma down")
+            original_upsert(**kwargs)
+
+        collection.upsert = flaky_upsert
+        with self.assertRaises(RuntimeError):
+            import_snapshot(self.path, log=lambda msg: None)
+        self.assertEqual(Document.objects.count(), 0)
+        self.assertEqual(len(collection.get(where={"doc_id": str(second.id)})["ids"]), 2)
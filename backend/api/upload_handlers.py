@@ -0,0 +1,145 @@
+import os
+import codecs
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = ['.pdf', '.docx', '.txt']
+
+# Default cap if settings.MAX_UPLOAD_SIZE is not set (500 MB)
+DEFAULT_MAX_UPLOAD_SIZE = 500 * 1024 * 1024
+
+# UTF-16/32 text is full of NUL bytes, so recognise it by its BOM
+TEXT_BOMS = (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+
+def sniff_file_type(head):
+    """Guess pdf/docx/txt from the first bytes of a file"""
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    if head.startswith(b'PK\x03\x04'):
+        # DOCX is a zip container
+        return 'docx'
+    if head.startswith(TEXT_BOMS) or b'\x00' not in head:
+        return 'txt'
+    return None
+
+
+class StreamedUploadedFile(UploadedFile):
+    """An upload already written to its final place in MEDIA_ROOT"""
+
+    def __init__(self, file, name, storage_name, content_type, size, charset,
+                 sha256, sniffed_type, content_type_extra=None):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.storage_name = storage_name  # Relative name to put on Document.file
+        self.sha256 = sha256
+        self.sniffed_type = sniffed_type
+
+    @property
+    def path(self):
+        return self.file.name
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class StreamingDocumentUploadHandler(FileUploadHandler):
+    """
+    Writes upload chunks straight to media/documents/ while hashing and
+    sniffing the type, so nothing is buffered in memory or read back twice.
+    Problems are recorded on self.error/self.error_status for the view.
+    """
+    chunk_size = 1024 * 1024  # 1 MB
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or getattr(settings, 'MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+        self.error = None
+        self.error_status = None
+
+    def _reject(self, message, status_code):
+        self.error = message
+        self.error_status = status_code
+        self._discard()
+
+    def _discard(self):
+        # Remove a partially written file. self.file stays (closed) because
+        # Django's parser closes handler.file itself after SkipFile/StopUpload.
+        file = getattr(self, 'file', None)
+        if file is not None and not file.closed:
+            file.close()
+            if os.path.exists(file.name):
+                os.remove(file.name)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Reject from the Content-Length header before reading any of the body
+        if content_length and content_length > self.max_size + 64 * 1024:
+            self.error = f"File too large. Maximum size is {self.max_size // (1024 * 1024)} MB"
+            self.error_status = 413
+            logger.warning(f"Upload rejected early, Content-Length {content_length}")
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset,
+                         content_type_extra)
+
+        self.extension = os.path.splitext(file_name)[1].lower()
+        if self.extension not in ALLOWED_EXTENSIONS:
+            self._reject(f"Unsupported file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}", 400)
+            raise SkipFile()
+
+        # Claim a free name in media/documents/ and stream into it
+        self.storage_name = default_storage.get_available_name(f"documents/{file_name}")
+        path = default_storage.path(self.storage_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'xb+')
+        self.hasher = hashlib.sha256()
+        self.sniffed_type = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self._reject(f"File too large. Maximum size is {self.max_size // (1024 * 1024)} MB", 413)
+            raise StopUpload(connection_reset=True)
+
+        if start == 0:
+            # Check the content matches the extension using the first chunk
+            self.sniffed_type = sniff_file_type(raw_data)
+            if self.sniffed_type != self.extension[1:]:
+                self._reject(f"File content does not match extension {self.extension}", 400)
+                raise SkipFile()
+
+        self.file.write(raw_data)
+        self.hasher.update(raw_data)
+        # Returning None keeps the chunk away from any later handlers
+        return None
+
+    def file_complete(self, file_size):
+        if getattr(self, 'file', None) is None or self.file.closed:
+            return None
+        self.file.flush()
+        self.file.seek(0)
+        logger.info(f"Streamed {file_size} bytes to {self.storage_name}")
+        return StreamedUploadedFile(
+            file=self.file,
+            name=self.file_name,
+            storage_name=self.storage_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            sha256=self.hasher.hexdigest(),
+            sniffed_type=self.sniffed_type,
+            content_type_extra=self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        self._discard()
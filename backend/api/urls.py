@@ -4,10 +4,11 @@
 
 # api/urls.py
 from django.urls import path
-from .views import DocumentUploadView, list_documents, query
+from .views import DocumentUploadView, list_documents, query, metrics
 
 urlpatterns = [
     path('upload/', DocumentUploadView.as_view(), name='upload'),
     path('documents/', list_documents, name='documents'),
     path('query/', query, name='query'),
+    path('metrics/', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -3,10 +3,17 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 from rest_framework.decorators import api_view
 from rest_framework import status
+from rest_framework.exceptions import NotFound
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET, condition
 from .models import Document
-from .serializers import DocumentSerializer
+from .serializers import DocumentSerializer, DocumentListSerializer
+from .pagination import DocumentCursorPagination, document_list_etag, get_document_count
 from .services.processor import process_document
 from .services.rag import answer_query
+from .upload_handlers import StreamingDocumentUploadHandler, StreamedUploadedFile, ALLOWED_EXTENSIONS
+from .services.vector_store import is_valid_tenant
+from .services.metrics import span, start_request_timings, stop_request_timings, render_metrics
 import logging
 import os
 
@@ -16,42 +23,79 @@ logger = logging.getLogger(__name__)
 class DocumentUploadView(APIView):
     parser_classes = [MultiPartParser]  # Accepts file uploads
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Stream the upload straight to media/. This has to happen before
+        # authentication, whose CSRF check reads request.POST for session users.
+        self.upload_handler = StreamingDocumentUploadHandler(request)
+        request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+
     def post(self, request):
         logger.info("Document upload request received")
+        upload_handler = self.upload_handler
+        
+        data = request.data
+        
+        # Size limit or content sniffing rejected the upload
+        if upload_handler.error:
+            return Response(
+                {"error": upload_handler.error}, 
+                status=upload_handler.error_status
+            )
         
         # Check if file was provided
-        if 'file' not in request.data:
+        if 'file' not in data:
             return Response(
                 {"error": "No file provided"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        file_obj = request.data['file']
+        file_obj = data['file']
+        if not isinstance(file_obj, StreamedUploadedFile):
+            # Parsed by some other handler, so size and type were never checked
+            return Response(
+                {"error": "Upload could not be processed"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         logger.info(f"Uploading file: {file_obj.name}, size: {file_obj.size}")
         
         # Check file type is supported
-        allowed_extensions = ['.pdf', '.docx', '.txt']
         file_ext = os.path.splitext(file_obj.name)[1].lower()
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTENSIONS:
+            return Response(
+                {"error": f"Unsupported file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Tenant ends up in a collection name, so only allow a safe subset
+        tenant = data.get('tenant') or None
+        if tenant is not None and not is_valid_tenant(tenant):
+            file_obj.close()
+            os.remove(file_obj.path)
             return Response(
-                {"error": f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"}, 
+                {"error": "Invalid tenant. Use up to 40 letters, digits, '_' or '-', starting and ending with a letter or digit"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
-            # Create database record for the document
+            # Create database record for the document. The handler already
+            # wrote the file into media/, so point the field at it (no copy)
             doc = Document.objects.create(
                 title=file_obj.name,
-                file=file_obj,
+                file=file_obj.storage_name,
                 file_size=file_obj.size,
                 file_type=file_ext[1:],  # Remove dot from extension
+                checksum=file_obj.sha256,
                 status='P'  # Set status to Pending
             )
             logger.info(f"Document record created with ID: {doc.id}")
             
             # Process the document (extract text, chunk, embed)
             logger.info(f"Starting document processing for doc_id: {doc.id}")
-            success, page_count = process_document(doc.file.path, doc.id)
+            with span("upload"):
+                success, page_count = process_document(
+                    doc.file.path, doc.id, file_obj.file, tenant=tenant
+                )
             doc.page_count = page_count
             
             # Update status based on processing result
@@ -74,17 +118,51 @@ class DocumentUploadView(APIView):
                 {"error": f"Upload failed: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        finally:
+            file_obj.close()
 
-# Lists all uploaded documents
+# Lists uploaded documents, a page at a time
+@condition(etag_func=document_list_etag)
 @api_view(['GET'])
 def list_documents(request):
-    """Get list of all documents"""
+    """Get documents newest first
+
+    Query params: cursor, page_size, status (P/C/F), fields (comma-separated).
+    Responds 304 when the client's If-None-Match still matches.
+    """
     try:
-        # Get all documents sorted by upload date (newest first)
-        docs = Document.objects.all().order_by('-created_at')
-        logger.info(f"Returning {docs.count()} documents")
-        # Return serialized document data
-        return Response(DocumentSerializer(docs, many=True).data)
+        docs = Document.objects.all()
+        
+        # Optional status filter
+        doc_status = request.query_params.get('status')
+        if doc_status:
+            if doc_status not in dict(Document.STATUS_CHOICES):
+                return Response(
+                    {"error": f"Invalid status. Allowed: {', '.join(dict(Document.STATUS_CHOICES))}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            docs = docs.filter(status=doc_status)
+        
+        # Optional field selection
+        fields = request.query_params.get('fields')
+        if fields:
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
+            unknown = set(fields) - set(DocumentListSerializer.Meta.fields)
+            if unknown:
+                return Response(
+                    {"error": f"Unknown fields: {', '.join(sorted(unknown))}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        # Only load the columns the serializer needs
+        serializer_fields = fields or DocumentListSerializer.Meta.fields
+        paginator = DocumentCursorPagination()
+        page = paginator.paginate_queryset(docs.only(*serializer_fields, 'created_at'), request)
+        data = DocumentListSerializer(page, many=True, fields=fields).data
+        return paginator.get_paginated_response(data, count=get_document_count(docs, doc_status, request))
+    except NotFound:
+        # Bad cursor
+        raise
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
         return Response(
@@ -128,10 +206,21 @@ def query(request):
             status=status.HTTP_404_NOT_FOUND
         )
     
+    # Client can ask for a per-stage timing breakdown in the response
+    include_timings = str(request.data.get('timings', request.query_params.get('timings', ''))).lower() in ('1', 'true', 'yes')
+    
     try:
         # Process the question using RAG system
         logger.info(f"Processing query for doc_id: {doc_id}, question: {question}")
-        result = answer_query(doc_id, question)
+        start_request_timings()
+        try:
+            with span("query"):
+                result = answer_query(doc_id, question)
+        finally:
+            timings = stop_request_timings()
+        
+        if include_timings:
+            result['timings'] = timings
         
         # Add document info to response
         result['document'] = {
@@ -148,4 +237,10 @@ def query(request):
         return Response(
             {"error": f"Query processing failed: {str(e)}"}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+# Exposes pipeline metrics for Prometheus scraping
+@require_GET
+def metrics(request):
+    """Stage latency histograms and counters in Prometheus text format"""
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -75,6 +75,30 @@ TEMPLATES = [
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Largest document upload accepted, checked while streaming (bytes)
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 500 * 1024 * 1024))
+
+# ChromaDB location
+CHROMA_DB_PATH = os.environ.get('CHROMA_DB_PATH', 'E:/ragproj/chromadb_data')
+
+# How documents are spread over ChromaDB collections: 'single' (one "documents"
+# collection), 'hash' (SHARDS collections by doc id), 'tenant' or 'size'.
+# Run `python manage.py reshard_vectors` after changing it.
+VECTOR_PARTITIONING = {
+    'SCHEME': os.environ.get('VECTOR_PARTITION_SCHEME', 'single'),
+    'PREFIX': 'documents',
+    'SHARDS': 8,
+    'SIZE_CLASSES': [('small', 50), ('medium', 500), ('large', None)],  # by chunk count
+    'MAX_WORKERS': 8,  # parallel fan-out across partitions
+}
+
+# Optional in-process vector index for hot documents (falls back to ChromaDB on miss)
+LOCAL_VECTOR_INDEX = {
+    'ENABLED': os.environ.get('LOCAL_VECTOR_INDEX', '0') == '1',
+    'PATH': os.path.join(BASE_DIR, 'vector_index'),
+    'MEMORY_BUDGET_MB': int(os.environ.get('LOCAL_VECTOR_INDEX_MB', 256)),
+}
+
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 